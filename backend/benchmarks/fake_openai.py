@@ -0,0 +1,188 @@
+"""
+Local OpenAI-compatible fake for load tests.
+
+Serves POST /v1/chat/completions (plain and streamed) with a lognormal latency
+distribution and a configurable share of 429 responses. Summary prompts get a
+canned bullet; sort prompts get a valid JSON assignment for every participant.
+
+Standalone:
+    python benchmarks/fake_openai.py --port 8900 --latency-median 0.8 --rate-429 0.05
+then point the backend at it with OPENAI_BASE_URL=http://127.0.0.1:8900/v1
+"""
+import argparse
+import json
+import math
+import random
+import re
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+PARTICIPANT_PATTERN = re.compile(r"^- ([0-9a-fA-F-]{36}):", re.MULTILINE)
+
+
+class FakeOpenAIConfig:
+    def __init__(self, latency_median: float = 0.5, latency_sigma: float = 0.5, rate_429: float = 0.0,
+                 chunk_chars: int = 48, seed=None):
+        self.latency_median = latency_median
+        self.latency_sigma = latency_sigma
+        self.rate_429 = rate_429
+        self.chunk_chars = chunk_chars
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.rate_limited = 0
+
+    def sample_latency(self) -> float:
+        with self.lock:
+            if self.latency_median <= 0:
+                return 0.0
+            return self.random.lognormvariate(math.log(self.latency_median), self.latency_sigma)
+
+    def should_rate_limit(self) -> bool:
+        with self.lock:
+            self.requests += 1
+            limited = self.random.random() < self.rate_429
+            self.rate_limited += int(limited)
+            return limited
+
+
+def _completion_text(messages) -> str:
+    prompt = messages[-1].get("content", "") if messages else ""
+    participants = PARTICIPANT_PATTERN.findall(prompt)
+    if not participants:
+        return "- Warm, curious and easygoing; enjoys small groups and shared hobbies."
+
+    groups = re.findall(r"Group [A-Z]", prompt.split("Participants:")[0]) or ["Group A", "Group B", "Group C"]
+    groups = sorted(set(groups))
+    return json.dumps({
+        user_id: {
+            "family": groups[idx % len(groups)],
+            "notes": "Placed by the load-test fake.",
+            "confidence": 0.9,
+        }
+        for idx, user_id in enumerate(participants)
+    })
+
+
+def _usage(messages, content: str):
+    prompt_tokens = sum(len(m.get("content", "")) for m in messages) // 4
+    completion_tokens = len(content) // 4
+    return {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens}
+
+
+def make_handler(config: FakeOpenAIConfig):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, format, *args):
+            pass
+
+        def _send_json(self, status: int, payload, headers=None):
+            body = json.dumps(payload).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            for name, value in (headers or {}).items():
+                self.send_header(name, value)
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_POST(self):
+            body = self.rfile.read(int(self.headers.get("Content-Length", 0)) or 0)
+            if not self.path.rstrip("/").endswith("/chat/completions"):
+                self._send_json(404, {"error": {"message": "Not found", "type": "invalid_request_error"}})
+                return
+
+            request = json.loads(body or b"{}")
+            if config.should_rate_limit():
+                self._send_json(
+                    429,
+                    {"error": {"message": "Rate limit reached (fake).", "type": "requests", "code": "rate_limit_exceeded"}},
+                    headers={"retry-after-ms": "200"},
+                )
+                return
+
+            latency = config.sample_latency()
+            messages = request.get("messages", [])
+            model = request.get("model", "gpt-4o-mini")
+            content = _completion_text(messages)
+            completion_id = f"chatcmpl-{uuid.uuid4().hex[:24]}"
+            created = int(time.time())
+
+            if not request.get("stream"):
+                time.sleep(latency)
+                self._send_json(200, {
+                    "id": completion_id, "object": "chat.completion", "created": created, "model": model,
+                    "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+                    "usage": _usage(messages, content),
+                })
+                return
+
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.send_header("Cache-Control", "no-cache")
+            self.send_header("Connection", "close")
+            self.end_headers()
+            self.close_connection = True
+
+            pieces = [content[i:i + config.chunk_chars] for i in range(0, len(content), config.chunk_chars)] or [""]
+            delay = latency / len(pieces)
+
+            def send(chunk):
+                self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode("utf-8"))
+                self.wfile.flush()
+
+            for piece in pieces:
+                time.sleep(delay)
+                send({
+                    "id": completion_id, "object": "chat.completion.chunk", "created": created, "model": model,
+                    "choices": [{"index": 0, "delta": {"content": piece}, "finish_reason": None}],
+                })
+            send({
+                "id": completion_id, "object": "chat.completion.chunk", "created": created, "model": model,
+                "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}],
+            })
+            if (request.get("stream_options") or {}).get("include_usage"):
+                send({
+                    "id": completion_id, "object": "chat.completion.chunk", "created": created, "model": model,
+                    "choices": [], "usage": _usage(messages, content),
+                })
+            self.wfile.write(b"data: [DONE]\n\n")
+            self.wfile.flush()
+
+    return Handler
+
+
+def start_fake_openai(config: FakeOpenAIConfig, host: str = "127.0.0.1", port: int = 0) -> ThreadingHTTPServer:
+    """
+    Starts the fake in a daemon thread. The bound port is `server.server_address[1]`.
+    """
+    server = ThreadingHTTPServer((host, port), make_handler(config))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="fake-openai", daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8900)
+    parser.add_argument("--latency-median", type=float, default=0.5, help="Median response latency (s).")
+    parser.add_argument("--latency-sigma", type=float, default=0.5, help="Lognormal sigma of the latency.")
+    parser.add_argument("--rate-429", type=float, default=0.0, help="Share of requests answered with 429.")
+    args = parser.parse_args()
+
+    config = FakeOpenAIConfig(args.latency_median, args.latency_sigma, args.rate_429)
+    server = start_fake_openai(config, args.host, args.port)
+    print(f"Fake OpenAI listening on http://{args.host}:{server.server_address[1]}/v1")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
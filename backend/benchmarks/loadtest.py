@@ -0,0 +1,317 @@
+"""
+HTTP load test for the sort and key-check endpoints.
+
+Starts a fake OpenAI server (benchmarks/fake_openai.py), a throwaway SQLite
+database with access keys, and the Django app under gunicorn.conf.py. Then,
+for each target arrival rate, it drives open-loop Poisson traffic: a mix of
+/api/validate-key/ checks and sorts of synthetic sheets of several sizes.
+
+Reports throughput, p50/p95/p99 latency and error rate per request kind, and
+peak server memory (RSS of the gunicorn master plus workers) per scenario.
+
+Run from backend/:
+    python benchmarks/loadtest.py --rates 1,5,20 --duration 30 --sizes 10,50,200
+    python benchmarks/loadtest.py --asgi --sort-path /api/sort-async/ --rate-429 0.05
+"""
+import argparse
+import http.client
+import json
+import os
+import random
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from fake_openai import FakeOpenAIConfig, start_fake_openai  # noqa: E402
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+HOST_HEADER = "sortmycircle.xyz"
+KEY_COUNT = 50
+
+FIRST_NAMES = ["Alex", "Sam", "Jordan", "Taylor", "Casey", "Riley", "Morgan", "Jamie", "Avery", "Quinn"]
+HOBBIES = ["rock climbing", "anime", "baking", "pickup basketball", "board games", "k-pop dance",
+           "thrifting", "photography", "hiking", "video games", "journaling", "open mic nights"]
+VIBES = ["Chill night in", "Going out with a big group", "Adventure somewhere new", "Studying together"]
+PREFERENCE_COLUMN = "Who you you want to be paired with? (You can list multiple names, just remember to put first and last)"
+
+
+def synthetic_sheet(rows: int, seed: int = 0) -> bytes:
+    """
+    A CSV shaped like the real Google Form export.
+    """
+    import csv
+    import io
+
+    rng = random.Random(seed)
+    names = [f"{rng.choice(FIRST_NAMES)} Member{i}" for i in range(rows)]
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow([
+        "Timestamp", "First and Last Name", "Email",
+        "What are your hobbies and interests outside of class?",
+        "How would you describe your ideal weekend?",
+        "Do you agree to the community guidelines?",
+        PREFERENCE_COLUMN,
+    ])
+    for i, name in enumerate(names):
+        writer.writerow([
+            f"2025-08-{1 + i % 28:02d} 12:{i % 60:02d}:00", name, f"member{i}@example.edu",
+            ", ".join(rng.sample(HOBBIES, 3)) + ". " + "I like meeting new people. " * rng.randint(1, 4),
+            rng.choice(VIBES), "Yes",
+            rng.choice(names),
+        ])
+    return buffer.getvalue().encode("utf-8")
+
+
+def _multipart(fields, files):
+    boundary = uuid.uuid4().hex
+    lines = []
+    for name, value in fields.items():
+        lines += [f"--{boundary}", f'Content-Disposition: form-data; name="{name}"', "", value]
+    body = "\r\n".join(lines).encode("utf-8")
+    for name, (filename, content) in files.items():
+        body += (
+            f"\r\n--{boundary}\r\nContent-Disposition: form-data; name=\"{name}\"; filename=\"{filename}\"\r\n"
+            f"Content-Type: text/csv\r\n\r\n"
+        ).encode("utf-8") + content
+    body += f"\r\n--{boundary}--\r\n".encode("utf-8")
+    return body, f"multipart/form-data; boundary={boundary}"
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _rss_bytes(root_pid: int) -> int:
+    """
+    Total RSS of a process and its children, read from /proc (Linux only).
+    """
+    try:
+        pids = [root_pid]
+        for entry in os.listdir("/proc"):
+            if entry.isdigit():
+                try:
+                    with open(f"/proc/{entry}/stat") as f:
+                        if int(f.read().rsplit(")", 1)[1].split()[1]) == root_pid:
+                            pids.append(int(entry))
+                except (OSError, IndexError, ValueError):
+                    continue
+        total = 0
+        for pid in pids:
+            try:
+                with open(f"/proc/{pid}/status") as f:
+                    for line in f:
+                        if line.startswith("VmRSS:"):
+                            total += int(line.split()[1]) * 1024
+            except OSError:
+                continue
+        return total
+    except OSError:
+        return 0
+
+
+class Server:
+    def __init__(self, args, fake_url: str, workdir: str):
+        self.port = _free_port()
+        self.env = dict(
+            os.environ,
+            DJANGO_SETTINGS_MODULE="mysite.settings",
+            SECRET_KEY="loadtest",
+            OPENAI_API_KEY="sk-loadtest",
+            OPENAI_BASE_URL=fake_url,
+            DB_URL=f"sqlite:///{os.path.join(workdir, 'loadtest.sqlite3')}",
+            DB_SSL_REQUIRE="false",
+            GUNICORN_BIND=f"127.0.0.1:{self.port}",
+            GUNICORN_WORKERS=str(args.workers),
+            GUNICORN_THREADS=str(args.threads),
+        )
+        if args.asgi:
+            self.env.update(GUNICORN_APP="mysite.asgi:application", GUNICORN_WORKER_CLASS="uvicorn.workers.UvicornWorker")
+        self.workdir = workdir
+        self.process = None
+
+    def prepare(self):
+        subprocess.run([sys.executable, "manage.py", "migrate", "--noinput", "-v", "0"],
+                       cwd=BACKEND_DIR, env=self.env, check=True)
+        subprocess.run([sys.executable, "manage.py", "shell", "-c", (
+            "from polls.models import AccessKey\n"
+            f"for i in range({KEY_COUNT}):\n"
+            "    AccessKey.objects.update_or_create(key=f'loadtest-{i}', defaults={"
+            "'usage_limit': 10**9, 'usage_count': 0, 'device_id': f'loadtest-device-{i}'})\n"
+        )], cwd=BACKEND_DIR, env=self.env, check=True)
+
+    def start(self, timeout: float = 60.0):
+        self.process = subprocess.Popen(
+            [sys.executable, "-m", "gunicorn", "-c", os.path.join(BACKEND_DIR, "gunicorn.conf.py")],
+            cwd=self.workdir, env=dict(self.env, PYTHONPATH=BACKEND_DIR),
+            stdout=subprocess.DEVNULL, stderr=open(os.path.join(self.workdir, "server.log"), "wb"),
+        )
+        started = time.monotonic()
+        while time.monotonic() - started < timeout:
+            try:
+                status, _ = request(self.port, "GET", "/api/verify-key/", timeout=1)
+                if status:
+                    return
+            except OSError:
+                time.sleep(0.1)
+        raise TimeoutError("Django server did not start; see server.log in the work dir.")
+
+    def stop(self):
+        if self.process:
+            self.process.terminate()
+            self.process.wait(timeout=60)
+
+
+def request(port: int, method: str, path: str, body: bytes = b"", content_type: str = None, timeout: float = 600):
+    conn = http.client.HTTPConnection("127.0.0.1", port, timeout=timeout)
+    headers = {"Host": HOST_HEADER}
+    if content_type:
+        headers["Content-Type"] = content_type
+    try:
+        conn.request(method, path, body=body, headers=headers)
+        response = conn.getresponse()
+        return response.status, response.read()
+    finally:
+        conn.close()
+
+
+def _percentile(values, pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, int(round(pct / 100 * len(ordered) + 0.5)) - 1))
+    return ordered[index]
+
+
+def run_scenario(server: Server, args, rate: float, sheets, pool: ThreadPoolExecutor):
+    rng = random.Random(args.seed)
+    results, lock = [], threading.Lock()
+    peak_rss, stop_sampling = [0], threading.Event()
+
+    def sample_memory():
+        while not stop_sampling.is_set():
+            peak_rss[0] = max(peak_rss[0], _rss_bytes(server.process.pid))
+            stop_sampling.wait(0.5)
+
+    def fire(kind, method, path, body=b"", content_type=None):
+        started = time.perf_counter()
+        try:
+            status, _ = request(server.port, method, path, body, content_type, timeout=args.request_timeout)
+            ok = 200 <= status < 300
+        except (OSError, http.client.HTTPException):
+            status, ok = None, False
+        with lock:
+            results.append((kind, time.perf_counter() - started, status, ok, time.perf_counter()))
+
+    sampler = threading.Thread(target=sample_memory, daemon=True)
+    sampler.start()
+
+    scenario_start = time.perf_counter()
+    next_arrival = scenario_start
+    futures = []
+    while next_arrival - scenario_start < args.duration:
+        delay = next_arrival - time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)
+
+        if rng.random() < args.key_fraction:
+            idx = rng.randrange(KEY_COUNT)
+            body = json.dumps({"key": f"loadtest-{idx}", "device_id": f"loadtest-device-{idx}"}).encode("utf-8")
+            futures.append(pool.submit(fire, "validate-key", "POST", "/api/validate-key/", body, "application/json"))
+        else:
+            size = rng.choice(list(sheets))
+            # A distinct instruction per request, so identical sorts are neither
+            # coalesced nor resumed from each other's checkpoints
+            instruction = f"Group people into 4 groups. (load test request {len(futures)})"
+            body, content_type = _multipart({"comments": instruction}, {"file": (f"sheet_{size}.csv", sheets[size])})
+            futures.append(pool.submit(fire, f"sort-{size}", "POST", args.sort_path, body, content_type))
+
+        next_arrival += rng.expovariate(rate)
+
+    for future in futures:
+        future.result()
+    elapsed = time.perf_counter() - scenario_start
+    stop_sampling.set()
+    sampler.join()
+
+    report = {"rate": rate, "elapsed": round(elapsed, 2), "peak_rss_mb": round(peak_rss[0] / 2**20, 1), "kinds": {}}
+    for kind in sorted({r[0] for r in results}):
+        rows = [r for r in results if r[0] == kind]
+        latencies = [r[1] for r in rows]
+        report["kinds"][kind] = {
+            "requests": len(rows),
+            "throughput_rps": round(sum(1 for r in rows if r[3]) / elapsed, 3),
+            "p50_ms": round(_percentile(latencies, 50) * 1000, 1),
+            "p95_ms": round(_percentile(latencies, 95) * 1000, 1),
+            "p99_ms": round(_percentile(latencies, 99) * 1000, 1),
+            "mean_ms": round(statistics.fmean(latencies) * 1000, 1),
+            "error_rate": round(sum(1 for r in rows if not r[3]) / len(rows), 3),
+        }
+    return report
+
+
+def print_report(report):
+    print(f"\n=== {report['rate']} req/s  ({report['elapsed']}s, peak server RSS {report['peak_rss_mb']} MB) ===")
+    print(f"{'kind':<14}{'reqs':>6}{'ok/s':>9}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'errors':>9}")
+    for kind, row in report["kinds"].items():
+        print(
+            f"{kind:<14}{row['requests']:>6}{row['throughput_rps']:>9}{row['p50_ms']:>10}"
+            f"{row['p95_ms']:>10}{row['p99_ms']:>10}{row['error_rate']:>9.1%}"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rates", default="1,5", help="Comma-separated target arrival rates (req/s), one scenario each.")
+    parser.add_argument("--duration", type=float, default=30, help="Seconds of arrivals per scenario.")
+    parser.add_argument("--sizes", default="10,50,200", help="Comma-separated synthetic sheet sizes (rows).")
+    parser.add_argument("--key-fraction", type=float, default=0.8, help="Share of arrivals that are key checks.")
+    parser.add_argument("--sort-path", default="/api/sort/")
+    parser.add_argument("--asgi", action="store_true", help="Serve mysite.asgi with uvicorn workers.")
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--latency-median", type=float, default=0.5, help="Fake OpenAI median latency (s).")
+    parser.add_argument("--latency-sigma", type=float, default=0.5)
+    parser.add_argument("--rate-429", type=float, default=0.0, help="Share of fake OpenAI calls answered with 429.")
+    parser.add_argument("--request-timeout", type=float, default=600)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", help="Also write the reports to this JSON file.")
+    args = parser.parse_args()
+
+    config = FakeOpenAIConfig(args.latency_median, args.latency_sigma, args.rate_429, seed=args.seed)
+    fake = start_fake_openai(config)
+    fake_url = f"http://127.0.0.1:{fake.server_address[1]}/v1"
+    sheets = {int(size): synthetic_sheet(int(size), seed=args.seed) for size in args.sizes.split(",")}
+
+    reports = []
+    with tempfile.TemporaryDirectory(prefix="loadtest-") as workdir:
+        server = Server(args, fake_url, workdir)
+        server.prepare()
+        server.start()
+        try:
+            with ThreadPoolExecutor(max_workers=1024) as pool:
+                for rate in (float(r) for r in args.rates.split(",")):
+                    report = run_scenario(server, args, rate, sheets, pool)
+                    report["fake_openai"] = {"requests": config.requests, "rate_limited": config.rate_limited}
+                    print_report(report)
+                    reports.append(report)
+        finally:
+            server.stop()
+            fake.shutdown()
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(reports, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
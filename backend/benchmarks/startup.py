@@ -0,0 +1,109 @@
+"""
+Startup-time benchmark.
+
+Measures, over several fresh processes:
+  - import time: django.setup() + loading the URLconf (what every worker boot,
+    manage.py command and collectstatic pays)
+  - first-use time: the extra cost of importing the sorting pipeline on the first sort
+  - time-to-first-response: launching gunicorn with gunicorn.conf.py until it answers HTTP
+
+Run from backend/:
+    python benchmarks/startup.py --runs 5
+"""
+import argparse
+import http.client
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+IMPORT_SNIPPET = """
+import time
+started = time.perf_counter()
+import django
+django.setup()
+import mysite.urls
+boot = time.perf_counter() - started
+started = time.perf_counter()
+import polls.services, polls.async_services
+first_use = time.perf_counter() - started
+print(boot, first_use)
+"""
+
+
+def _env():
+    env = dict(os.environ)
+    env.setdefault("DJANGO_SETTINGS_MODULE", "mysite.settings")
+    env.setdefault("SECRET_KEY", "startup-benchmark")
+    env.setdefault("OPENAI_API_KEY", "sk-startup-benchmark")
+    env["PYTHONDONTWRITEBYTECODE"] = "1"
+    return env
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def measure_import(env):
+    output = subprocess.run(
+        [sys.executable, "-c", IMPORT_SNIPPET],
+        cwd=BACKEND_DIR, env=env, capture_output=True, text=True, check=True,
+    ).stdout.split()
+    return float(output[-2]), float(output[-1])
+
+
+def measure_first_response(env, timeout: float = 60.0) -> float:
+    port = _free_port()
+    server_env = dict(env, GUNICORN_BIND=f"127.0.0.1:{port}", GUNICORN_WORKERS="1")
+    started = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py"],
+        cwd=BACKEND_DIR, env=server_env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        while time.perf_counter() - started < timeout:
+            try:
+                conn = http.client.HTTPConnection("127.0.0.1", port, timeout=1)
+                # GET on a POST-only endpoint: no database or LLM needed, any status counts
+                conn.request("GET", "/api/verify-key/", headers={"Host": "sortmycircle.xyz"})
+                conn.getresponse().read()
+                return time.perf_counter() - started
+            except (ConnectionError, OSError, http.client.HTTPException):
+                time.sleep(0.02)
+        raise TimeoutError(f"gunicorn did not answer within {timeout}s")
+    finally:
+        server.terminate()
+        server.wait(timeout=30)
+
+
+def _report(label: str, samples):
+    samples_ms = [s * 1000 for s in samples]
+    print(
+        f"{label:<24} median {statistics.median(samples_ms):8.1f} ms   "
+        f"min {min(samples_ms):8.1f} ms   max {max(samples_ms):8.1f} ms"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--skip-server", action="store_true", help="Only measure import times.")
+    args = parser.parse_args()
+
+    env = _env()
+    boots, first_uses = zip(*(measure_import(env) for _ in range(args.runs)))
+    _report("import (boot)", boots)
+    _report("pipeline first use", first_uses)
+
+    if not args.skip_server:
+        _report("time to first response", [measure_first_response(env) for _ in range(args.runs)])
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,51 @@
+"""
+Gunicorn production serving profile.
+
+Sort requests spend almost all of their time waiting on OpenAI, so workers are
+threaded (gthread) rather than sync: one process serves several sorts at once
+without paying for another copy of pandas. Timeouts are sized for long
+LLM-bound requests and keep-alive outlasts the ALB idle timeout.
+
+Every setting can be overridden with a GUNICORN_* environment variable, e.g.
+GUNICORN_APP=mysite.asgi:application GUNICORN_WORKER_CLASS=uvicorn.workers.UvicornWorker
+to serve the async endpoints under ASGI.
+"""
+import multiprocessing
+import os
+
+wsgi_app = os.getenv("GUNICORN_APP", "mysite.wsgi:application")
+bind = os.getenv("GUNICORN_BIND", "0.0.0.0:8000")
+
+worker_class = os.getenv("GUNICORN_WORKER_CLASS", "gthread")
+workers = int(os.getenv("GUNICORN_WORKERS", min(multiprocessing.cpu_count(), 4)))
+threads = int(os.getenv("GUNICORN_THREADS", "8"))
+
+# A 1,000-person sort can take minutes; let it finish instead of killing the worker
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "600"))
+# A recycled or reloaded worker finishes its in-flight sorts before exiting, and
+# a sort may run for up to `timeout`
+graceful_timeout = int(os.getenv("GUNICORN_GRACEFUL_TIMEOUT", str(timeout)))
+# Longer than the ALB's 60s idle timeout so the LB never reuses a closed connection
+keepalive = int(os.getenv("GUNICORN_KEEPALIVE", "75"))
+
+# Recycle workers now and then to bound memory growth from large sheets (the
+# worker stops taking requests and gets graceful_timeout to finish its sorts)
+max_requests = int(os.getenv("GUNICORN_MAX_REQUESTS", "500"))
+max_requests_jitter = int(os.getenv("GUNICORN_MAX_REQUESTS_JITTER", "50"))
+
+# Load Django once in the master and fork workers from it (copy-on-write)
+preload_app = os.getenv("GUNICORN_PRELOAD", "true").lower() == "true"
+# Heartbeat files on tmpfs; /tmp on container overlay filesystems can stall workers
+worker_tmp_dir = os.getenv("GUNICORN_WORKER_TMP_DIR", "/dev/shm" if os.path.isdir("/dev/shm") else None)
+
+accesslog = "-"
+errorlog = "-"
+
+
+def on_starting(server):
+    # Import the heavy libraries once in the master so forked workers share
+    # their pages. No OpenAI client is built here: HTTP connection pools are not
+    # fork-safe, so each worker creates its own on first use.
+    if os.getenv("GUNICORN_PRELOAD_LIBS", "true").lower() == "true":
+        import pandas  # noqa: F401
+        import openai  # noqa: F401
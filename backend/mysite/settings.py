@@ -12,6 +12,7 @@ https://docs.djangoproject.com/en/5.2/ref/settings/
 
 from pathlib import Path
 import os
+import sys
 import dj_database_url
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -27,6 +28,41 @@ SECRET_KEY = os.getenv("SECRET_KEY")
 # SECURITY WARNING: ai key, do not share!
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
 
+# LLM concurrency & rate limits (async sort endpoints; shared by every sort in a worker)
+LLM_REQUESTS_PER_MINUTE = int(os.getenv("LLM_REQUESTS_PER_MINUTE", "500"))
+LLM_MAX_IN_FLIGHT = int(os.getenv("LLM_MAX_IN_FLIGHT", "32"))
+SORT_SUMMARY_CONCURRENCY = int(os.getenv("SORT_SUMMARY_CONCURRENCY", "8"))
+SORT_BATCH_CONCURRENCY = int(os.getenv("SORT_BATCH_CONCURRENCY", "4"))
+
+# Model cascade: comma-separated tiers, cheapest first; later tiers are escalation targets
+LLM_SUMMARY_MODELS = os.getenv("LLM_SUMMARY_MODELS", "gpt-4o-mini,gpt-4o")
+LLM_SORT_MODELS = os.getenv("LLM_SORT_MODELS", "gpt-4o-mini,gpt-4o")
+SUMMARY_PASSTHROUGH_CHARS = int(os.getenv("SUMMARY_PASSTHROUGH_CHARS", "160"))
+SORT_MIN_CONFIDENCE = float(os.getenv("SORT_MIN_CONFIDENCE", "0.6"))
+
+# Shorten summary prompts: abbreviate long form questions, drop answers most of the cohort shares
+STRIP_PROMPT_BOILERPLATE = os.getenv("STRIP_PROMPT_BOILERPLATE", "true").lower() == "true"
+
+# Batch size / concurrency per sheet size, produced by `manage.py tune_batches` (JSON)
+SORT_BATCH_TUNING_FILE = os.getenv("SORT_BATCH_TUNING_FILE")
+
+# Sort deadlines (seconds). Requests may send a shorter `deadline`; the cap stays under
+# the gunicorn worker timeout so a sort always answers before it would be killed.
+SORT_DEFAULT_DEADLINE_SECONDS = float(os.getenv("SORT_DEFAULT_DEADLINE_SECONDS", "540"))
+SORT_MAX_DEADLINE_SECONDS = float(
+    os.getenv("SORT_MAX_DEADLINE_SECONDS", int(os.getenv("GUNICORN_TIMEOUT", "600")) - 30)
+)
+SORT_DEADLINE_RESERVE_SECONDS = float(os.getenv("SORT_DEADLINE_RESERVE_SECONDS", "5"))
+
+# Resumable sorts: progress is checkpointed to the database; abandoned checkpoints expire
+SORT_CHECKPOINT_FLUSH_EVERY = int(os.getenv("SORT_CHECKPOINT_FLUSH_EVERY", "25"))
+SORT_CHECKPOINT_TTL_HOURS = int(os.getenv("SORT_CHECKPOINT_TTL_HOURS", "24"))
+
+# LLM record/replay cassette (testing & benchmarking only; leave unset in production)
+LLM_CASSETTE_PATH = os.getenv("LLM_CASSETTE_PATH")
+LLM_CASSETTE_MODE = os.getenv("LLM_CASSETTE_MODE", "replay")  # "record" or "replay"
+LLM_CASSETTE_LATENCY = os.getenv("LLM_CASSETTE_LATENCY")  # seconds, or "recorded"
+
 # SECURITY WARNING: don't run with debug turned on in production!
 DEBUG = os.getenv("DEBUG")
 
@@ -124,7 +160,7 @@ DATABASES = {
     'default': dj_database_url.config(
         default=os.getenv("DB_URL"),
         conn_max_age=600,  # optional: keeps connection pool alive
-        ssl_require=True   # optional but recommended for RDS
+        ssl_require=os.getenv("DB_SSL_REQUIRE", "true").lower() == "true"  # recommended for RDS; off for local SQLite
     )
 }
 
@@ -133,6 +169,15 @@ CORS_ALLOWED_ORIGINS = [
     "http://localhost:3000",
 ]
 
+# Response headers the frontend may read from sort responses
+CORS_EXPOSE_HEADERS = [
+    "Content-Disposition",
+    "X-Device-Id",
+    "X-Sort-Coalesced",
+    "X-Sort-Plan",
+    "X-Sort-Degraded",
+]
+
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
 
@@ -16,12 +16,14 @@ Including another URLconf
 """
 from django.contrib import admin
 from django.urls import include, path
-from polls.views import handle_sorting, validate_key, verify_key_without_increment
+from polls.views import handle_sorting, handle_sorting_async, handle_bulk_sorting_async, validate_key, verify_key_without_increment
 
 urlpatterns = [
     path('keyboardsmashportal/', admin.site.urls),
     # path("", include("polls.urls")),
     path("api/sort/", handle_sorting),
+    path("api/sort-async/", handle_sorting_async),
+    path("api/sort/bulk/", handle_bulk_sorting_async),
     path("api/validate-key/", validate_key),
     path("api/verify-key/", verify_key_without_increment),
 ]
@@ -0,0 +1,439 @@
+import asyncio
+import hashlib
+import inspect
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from django.conf import settings
+
+from .cascade import SORT_MODELS, SUMMARY_MODELS, cascade_stats, is_passthrough, local_summary
+from .cassette import wrap_client
+from .services import (
+    _accept_or_escalate,
+    _batch_dict,
+    _batch_done,
+    _batch_group_names,
+    _build_batch_instruction,
+    _build_sort_prompt,
+    _budget_client,
+    _build_summary_prompt,
+    _call_timeout,
+    _chunk_content,
+    _finish_sort_stream,
+    _report_batch_result,
+    _sort_request,
+    _sortable_summaries,
+    OnAssignment,
+    OnBatch,
+    OnSummary,
+)
+from .checkpoints import batch_key
+from .budget import SUMMARY, SortBudget
+from .streaming import AssignmentStreamParser
+
+# Async OpenAI clients, one per event loop: a client's connection pool belongs to the
+# loop it was first used on, and async views under WSGI each get their own loop.
+# Built on first use, after the worker has forked, and closed when their loop shuts
+# down. Setting `async_client` makes every loop use that client instead (commands
+# that run on a single loop, tests).
+async_client = None
+_loop_clients: Dict[asyncio.AbstractEventLoop, Tuple[object, object]] = {}
+_loop_clients_lock = threading.Lock()
+
+async def _close_with_loop(client):
+    # Parked at the yield for the loop's lifetime. asyncio.run (which async_to_sync
+    # uses) closes open async generators before closing the loop, so the client's
+    # connections are closed on the loop that opened them.
+    try:
+        yield
+    finally:
+        await client.close()
+
+def get_async_client():
+    if async_client is not None:
+        return async_client
+
+    loop = asyncio.get_running_loop()
+    with _loop_clients_lock:
+        entry = _loop_clients.get(loop)
+        if entry is None:
+            from openai import AsyncOpenAI
+            for closed in [l for l in _loop_clients if l.is_closed()]:
+                del _loop_clients[closed]
+            inner = AsyncOpenAI(api_key=settings.OPENAI_API_KEY)
+            closer = _close_with_loop(inner)
+            asyncio.ensure_future(closer.__anext__())
+            entry = _loop_clients[loop] = (wrap_client(inner, is_async=True), closer)
+    return entry[0]
+
+# How many LLM calls a single sort may have in flight at once
+SUMMARY_CONCURRENCY = getattr(settings, "SORT_SUMMARY_CONCURRENCY", 8)
+BATCH_CONCURRENCY = getattr(settings, "SORT_BATCH_CONCURRENCY", 4)
+
+# Shared LLM rate limit for every sort in this worker
+LLM_REQUESTS_PER_MINUTE = getattr(settings, "LLM_REQUESTS_PER_MINUTE", 500)
+LLM_MAX_IN_FLIGHT = getattr(settings, "LLM_MAX_IN_FLIGHT", 32)
+
+# CPU-bound pandas steps run here so they never block the event loop
+cpu_executor = ThreadPoolExecutor(
+    max_workers=getattr(settings, "SORT_CPU_WORKERS", 4),
+    thread_name_prefix="sort-cpu",
+)
+
+async def run_cpu_bound(func, *args, **kwargs):
+    """
+    Runs a blocking (pandas/CSV) step on the shared CPU executor.
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(cpu_executor, lambda: func(*args, **kwargs))
+
+class AsyncRateLimiter:
+    """
+    Token bucket over requests per minute plus a cap on in-flight LLM calls.
+    Use as `async with rate_limiter:` around each call. State sits behind a thread
+    lock and waiters poll with `asyncio.sleep`, so one limiter holds for every
+    event loop in the worker (async views under WSGI each get their own loop).
+    """
+
+    # How often a caller waiting for a free slot checks again
+    poll_seconds = 0.05
+
+    def __init__(self, requests_per_minute: int, max_in_flight: int):
+        self.rate = requests_per_minute / 60.0
+        self.capacity = max(1, max_in_flight)
+        self.max_in_flight = max(1, max_in_flight)
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self._tokens = float(self.capacity)
+        self._updated = time.monotonic()
+
+    def _try_acquire(self) -> float:
+        # Takes a slot and a token when both are free; otherwise returns how long to wait
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            if self._in_flight >= self.max_in_flight:
+                return self.poll_seconds
+            if self._tokens < 1:
+                return (1 - self._tokens) / self.rate
+            self._tokens -= 1
+            self._in_flight += 1
+            return 0.0
+
+    async def __aenter__(self):
+        while True:
+            wait = self._try_acquire()
+            if not wait:
+                return self
+            await asyncio.sleep(wait)
+
+    async def __aexit__(self, exc_type, exc, tb):
+        with self._lock:
+            self._in_flight -= 1
+
+rate_limiter = AsyncRateLimiter(LLM_REQUESTS_PER_MINUTE, LLM_MAX_IN_FLIGHT)
+
+class _Abandoned(Exception):
+    """
+    Set on a pending summary whose request was cancelled before it finished.
+    """
+
+class SummaryCache:
+    """
+    Summaries keyed by a hash of the summary prompt.
+    Shared across the sheets of one bulk sort so repeated answers are summarized once;
+    a prompt already in flight for another sheet is awaited rather than re-sent.
+    """
+
+    def __init__(self):
+        self._summaries: Dict[str, str] = {}
+        self._pending: Dict[str, asyncio.Future] = {}
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(prompt: str) -> str:
+        return hashlib.sha256(prompt.encode("utf-8")).hexdigest()
+
+    async def get_or_compute(self, prompt: str, compute) -> str:
+        key = self.key(prompt)
+        if key in self._summaries:
+            self.hits += 1
+            return self._summaries[key]
+        if key in self._pending:
+            self.hits += 1
+            try:
+                return await asyncio.shield(self._pending[key])
+            except _Abandoned:
+                # The sheet that sent this prompt was cut off (e.g. by its own
+                # deadline); this one still wants the summary, so it asks itself
+                self.hits -= 1
+                return await self.get_or_compute(prompt, compute)
+
+        self.misses += 1
+        future = asyncio.get_running_loop().create_future()
+        self._pending[key] = future
+        try:
+            summary = await compute()
+        except asyncio.CancelledError:
+            future.set_exception(_Abandoned())
+            future.exception()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            # Mark the exception as retrieved in case nobody else was waiting
+            future.exception()
+            raise
+        else:
+            self._summaries[key] = summary
+            future.set_result(summary)
+            return summary
+        finally:
+            del self._pending[key]
+
+# Step 1: Pre-Processing (async)
+async def _request_summary(user_id: str, prompt: str, budget: Optional[SortBudget] = None) -> str:
+    """
+    Walks the summary model cascade. Raises if every tier fails.
+    """
+    models = budget.models(SUMMARY_MODELS) if budget is not None else SUMMARY_MODELS
+    for tier, model in enumerate(models):
+        if tier:
+            cascade_stats.record_escalation("summary")
+        started = time.perf_counter()
+        try:
+            async with rate_limiter:
+                response = await _budget_client(get_async_client(), budget, SUMMARY).chat.completions.create(
+                    model=model,
+                    messages=[{"role": "user", "content": prompt}],
+                    temperature=0.5,
+                    **_call_timeout(budget, SUMMARY),
+                )
+            cascade_stats.record_call(model, time.perf_counter() - started, response.usage)
+            summary = response.choices[0].message.content.strip()
+            if summary:
+                return summary
+
+        except Exception as e:
+            cascade_stats.record_call(model, time.perf_counter() - started, failed=True)
+            print(f"❌ Error summarizing user {user_id} with {model}: {e}")
+
+    raise RuntimeError("every summary model failed")
+
+async def _summarize_member(
+    user_id: str,
+    content_parts: List[str],
+    cache: Optional[SummaryCache] = None,
+    budget: Optional[SortBudget] = None,
+) -> str:
+    if not content_parts:
+        return ""
+
+    cascade_stats.record_unit("summary")
+    if is_passthrough(content_parts):
+        cascade_stats.record_passthrough("summary")
+        return local_summary(content_parts)
+
+    if budget is not None and not budget.summaries_open():
+        budget.mark(SUMMARY, user_id)
+        return local_summary(content_parts)
+
+    prompt = _build_summary_prompt(content_parts)
+
+    async def request():
+        if cache is not None:
+            return await cache.get_or_compute(prompt, lambda: _request_summary(user_id, prompt, budget))
+        return await _request_summary(user_id, prompt, budget)
+
+    try:
+        if budget is None:
+            return await request()
+        return await asyncio.wait_for(request(), timeout=budget.remaining(budget.summary_deadline))
+
+    except Exception as e:
+        if budget is not None and not budget.summaries_open():
+            budget.mark(SUMMARY, user_id)
+            return local_summary(content_parts)
+        print(f"❌ Error summarizing user {user_id}: {e}")
+        return "[summary failed]"
+
+async def arun_preprocessing_pipeline(
+    members: Iterable[Tuple[str, List[str]]],
+    concurrency: int = SUMMARY_CONCURRENCY,
+    cache: Optional[SummaryCache] = None,
+    completed: Optional[Dict[str, str]] = None,
+    on_summary: OnSummary = None,
+    budget: Optional[SortBudget] = None,
+) -> Dict[str, str]:
+    """
+    Async version of `run_preprocessing_pipeline`.
+    A fixed pool of `concurrency` workers pulls from the member stream, so at most
+    that many members are held in memory and in flight at once.
+    Returns summaries in the same order as the member stream.
+    `on_summary` may be a plain function or a coroutine function.
+    """
+    members = iter(members)
+    order: List[str] = []
+    results: Dict[str, str] = {}
+    completed = completed or {}
+
+    async def worker():
+        for user_id, content_parts in members:
+            if not user_id:
+                continue
+            order.append(user_id)
+            if user_id in completed:
+                results[user_id] = completed[user_id]
+                continue
+
+            results[user_id] = await _summarize_member(user_id, content_parts, cache, budget)
+            if on_summary is not None and not (budget is not None and user_id in budget.degraded[SUMMARY]):
+                await _maybe_await(on_summary(user_id, results[user_id]))
+
+    await asyncio.gather(*(worker() for _ in range(max(1, concurrency))))
+    return {user_id: results[user_id] for user_id in order}
+
+async def _maybe_await(value):
+    if inspect.isawaitable(value):
+        return await value
+    return value
+
+# Step 2: Sorting (async)
+async def asort_users_with_gpt(
+    summaries: Dict[str, str],
+    instruction: str,
+    batch_size: int = 40,
+    concurrency: int = BATCH_CONCURRENCY,
+    on_entry: OnAssignment = None,
+    completed_batches: Optional[Dict[str, Dict]] = None,
+    on_batch: OnBatch = None,
+    budget: Optional[SortBudget] = None,
+) -> Dict[str, str]:
+    """
+    Async version of `sort_users_with_gpt`. Batches are sorted concurrently.
+    """
+    formatted_summaries = _sortable_summaries(summaries)
+
+    if len(formatted_summaries) <= batch_size:
+        print(f"🔹 Sorting {len(formatted_summaries)} users directly (no batching)...")
+        return await _asort_checkpointed_batch(
+            formatted_summaries, instruction, on_entry, None, completed_batches, on_batch, budget
+        )
+    else:
+        print(f"🔸 Sorting {len(formatted_summaries)} users in concurrent batches of {batch_size}...")
+        return await asort_users_in_batches(
+            formatted_summaries, instruction, batch_size, concurrency, on_entry, completed_batches, on_batch, budget
+        )
+
+async def _asort_checkpointed_batch(batch, instruction, on_entry, group_names, completed_batches, on_batch, budget=None) -> Dict:
+    key = batch_key(batch)
+    if completed_batches and key in completed_batches:
+        print(f"♻️ Reusing checkpointed result for {len(batch)} users.")
+        return completed_batches[key]
+
+    result = await asort_users_with_gpt_single_batch(batch, instruction, on_entry, group_names, budget)
+    if on_batch is not None and _batch_done(batch, result):
+        await _maybe_await(on_batch(key, result))
+    return result
+
+async def _astream_sort(prompt: str, model: str, on_entry: OnAssignment, budget: Optional[SortBudget] = None) -> Tuple[Dict, bool]:
+    parser = AssignmentStreamParser(on_entry=on_entry)
+    raw_parts, usage = [], None
+    started = time.perf_counter()
+
+    async def consume():
+        nonlocal usage
+        async with rate_limiter:
+            async for chunk in await _budget_client(get_async_client(), budget, "sort").chat.completions.create(
+                **_sort_request(prompt, model, budget)
+            ):
+                usage = getattr(chunk, "usage", None) or usage
+                text = _chunk_content(chunk)
+                raw_parts.append(text)
+                parser.feed(text)
+
+    try:
+        if budget is None:
+            await consume()
+        else:
+            await asyncio.wait_for(consume(), timeout=budget.remaining(budget.sort_deadline))
+
+        cascade_stats.record_call(model, time.perf_counter() - started, usage)
+        return _finish_sort_stream(parser, raw_parts)
+
+    except asyncio.TimeoutError:
+        cascade_stats.record_call(model, time.perf_counter() - started, usage)
+        print(f"⏰ Sort deadline reached; keeping {len(parser.entries)} streamed entries.")
+        return parser.entries, False
+
+    except Exception as e:
+        cascade_stats.record_call(model, time.perf_counter() - started, usage, failed=True)
+        print(f"❌ Error during GPT sorting with {model}:", e)
+        return parser.entries, False
+
+async def asort_users_with_gpt_single_batch(
+    summaries: Dict[str, str],
+    instruction: str,
+    on_entry: OnAssignment = None,
+    group_names: Optional[List[str]] = None,
+    budget: Optional[SortBudget] = None,
+) -> Dict[str, str]:
+    if budget is not None and not budget.sorting_open():
+        print(f"⏰ Sort deadline reached; {len(summaries)} users left for local placement.")
+        return {}
+
+    prompt = _build_sort_prompt(budget.shorten(summaries) if budget is not None else summaries, instruction)
+    models = budget.models(SORT_MODELS) if budget is not None else SORT_MODELS
+    best = {}
+
+    cascade_stats.record_unit("sort")
+    for tier, model in enumerate(models):
+        if tier:
+            if budget is not None and not budget.sorting_open():
+                break
+            cascade_stats.record_escalation("sort")
+        result, complete = await _astream_sort(prompt, model, on_entry, budget)
+        accepted, best = _accept_or_escalate(summaries, model, result, complete, best, group_names)
+        if accepted:
+            break
+
+    return best
+
+async def asort_users_in_batches(
+    summaries: Dict[str, str],
+    instruction: str,
+    batch_size: int = 40,
+    concurrency: int = BATCH_CONCURRENCY,
+    on_entry: OnAssignment = None,
+    completed_batches: Optional[Dict[str, Dict]] = None,
+    on_batch: OnBatch = None,
+    budget: Optional[SortBudget] = None,
+) -> Dict[str, str]:
+    batches = list(_batch_dict(summaries, batch_size))
+    total_batches = len(batches)
+    use_custom_groups, group_names = _batch_group_names(instruction)
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+
+    async def sort_batch(idx: int, batch: Dict[str, str]) -> Dict:
+        async with semaphore:
+            print(f"\n📦 Sorting batch {idx + 1}/{total_batches} with {len(batch)} users...")
+            batch_instruction = _build_batch_instruction(instruction, idx, total_batches, use_custom_groups, group_names)
+            result = await _asort_checkpointed_batch(
+                batch, batch_instruction, on_entry, group_names, completed_batches, on_batch, budget
+            )
+            _report_batch_result(idx, batch, result)
+            return result
+
+    full_result = {}
+    for result in await asyncio.gather(*(sort_batch(idx, batch) for idx, batch in enumerate(batches))):
+        full_result.update(result)
+
+    # Final check for unsorted users
+    final_missing = set(summaries) - set(full_result)
+    if final_missing:
+        print(f"\n🚨 Total unsorted users after batching: {len(final_missing)}")
+
+    return full_result
@@ -0,0 +1,94 @@
+import json
+import os
+from functools import lru_cache
+from typing import Dict, List, Optional
+
+from django.conf import settings
+
+# Runtime batch-size / concurrency policy.
+#
+# The tuning table maps sheet sizes to the batch size and batch concurrency that
+# worked best offline (see `manage.py tune_batches`), together with what that
+# choice measured: cohesion score, sort latency and call failure rate. Rows are
+# ordered by `max_members`; the last row may leave it null to cover any size.
+#
+# Without a tuning file the table has one row with the previous fixed defaults,
+# so behaviour only changes once a table has been produced and configured.
+
+TUNING_FILE = getattr(settings, "SORT_BATCH_TUNING_FILE", None)
+
+DEFAULT_TABLE = [
+    {
+        "max_members": None,
+        "batch_size": 40,
+        "concurrency": getattr(settings, "SORT_BATCH_CONCURRENCY", 4),
+    },
+]
+
+
+class BatchPlan:
+    """
+    Batch settings chosen for one sheet, plus the trade-off they were tuned for.
+    `expected` holds `score`, `latency_s` and `failure_rate` when the table has them,
+    as measured on a sheet of `tuned_members` members.
+    """
+
+    def __init__(self, members: int, batch_size: int, concurrency: int, expected: Optional[Dict] = None):
+        self.members = members
+        self.batch_size = batch_size
+        self.concurrency = concurrency
+        self.expected = expected or {}
+
+    def as_dict(self) -> Dict:
+        return {
+            "members": self.members,
+            "batch_size": self.batch_size,
+            "concurrency": self.concurrency,
+            "batches": -(-self.members // self.batch_size) if self.members else 0,
+            "expected": self.expected,
+        }
+
+    def header(self) -> str:
+        """
+        Compact form for the X-Sort-Plan response header.
+        """
+        parts = [f"batch_size={self.batch_size}", f"concurrency={self.concurrency}"]
+        parts += [f"expected_{name}={value}" for name, value in self.expected.items()]
+        return "; ".join(parts)
+
+
+def _validate(table: List[Dict], source: str) -> List[Dict]:
+    if not table:
+        raise ValueError(f"Batch tuning table {source} is empty.")
+    for row in table:
+        if int(row.get("batch_size", 0)) < 1 or int(row.get("concurrency", 0)) < 1:
+            raise ValueError(f"Batch tuning table {source} has an invalid row: {row}")
+    return sorted(table, key=lambda row: float("inf") if row.get("max_members") is None else row["max_members"])
+
+
+@lru_cache(maxsize=1)
+def load_table(path: Optional[str] = TUNING_FILE) -> List[Dict]:
+    if not path:
+        return DEFAULT_TABLE
+    if not os.path.exists(path):
+        print(f"⚠️ Batch tuning file not found, using defaults: {path}")
+        return DEFAULT_TABLE
+
+    with open(path, encoding="utf-8") as f:
+        data = json.load(f)
+    return _validate(data.get("table", data) if isinstance(data, dict) else data, path)
+
+
+def plan_for(members: int, table: Optional[List[Dict]] = None) -> BatchPlan:
+    """
+    Picks batch size and concurrency for a sheet with `members` sortable members.
+    """
+    table = table or load_table()
+    row = next(
+        (row for row in table if row.get("max_members") is None or members <= row["max_members"]),
+        table[-1],
+    )
+    expected = {
+        name: row[name] for name in ("score", "latency_s", "failure_rate", "tuned_members") if row.get(name) is not None
+    }
+    return BatchPlan(members, int(row["batch_size"]), int(row["concurrency"]), expected)
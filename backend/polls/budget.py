@@ -0,0 +1,196 @@
+import math
+import time
+from typing import Dict, List, Optional
+
+from django.conf import settings
+
+from .batch_policy import BatchPlan
+
+# Deadline-budgeted sorting.
+#
+# A sort gets a time budget (the request's `deadline`, capped below the worker
+# timeout). Before summarizing, and again before sorting, the budget estimates
+# how long the remaining work takes and plans to fit:
+#   - split the time left between the summary and sort stages; when the work
+#     doesn't fit, sorting keeps at least one round of batches and summaries get
+#     the rest (members they don't reach use their own answers as summary)
+#   - when the estimate doesn't fit, switch to economy mode: cheapest model only
+#     (no escalation), shorter summaries in sort prompts, smaller or more
+#     concurrent batches
+# While running, each stage stops starting new LLM calls at its deadline and
+# in-flight calls are cut off. Whatever was not finished is filled in locally:
+# members without a summary get their own answers as summary, members without a
+# family are placed by summary similarity. The sort always returns a complete
+# assignment; which members were degraded, and how, is reported.
+
+DEFAULT_DEADLINE = float(getattr(settings, "SORT_DEFAULT_DEADLINE_SECONDS", 540))
+MAX_DEADLINE = float(getattr(settings, "SORT_MAX_DEADLINE_SECONDS", 570))
+MIN_DEADLINE = 10.0
+# Kept back at the end for local placement and rendering the CSV (at most this,
+# and at most RESERVE_SHARE of the deadline, so short deadlines keep most of it)
+RESERVE_SECONDS = float(getattr(settings, "SORT_DEADLINE_RESERVE_SECONDS", 5))
+RESERVE_SHARE = 0.1
+
+# Planning estimates (seconds)
+EST_SUMMARY_SECONDS = float(getattr(settings, "SORT_EST_SUMMARY_SECONDS", 3))
+EST_SORT_BASE_SECONDS = float(getattr(settings, "SORT_EST_SORT_BASE_SECONDS", 3))
+EST_SORT_SECONDS_PER_MEMBER = float(getattr(settings, "SORT_EST_SORT_SECONDS_PER_MEMBER", 0.4))
+MAX_BATCH_CONCURRENCY = int(getattr(settings, "LLM_MAX_IN_FLIGHT", 32))
+ECONOMY_BATCH_SIZES = (30, 20, 10)
+# Summary length in sort prompts once in economy mode
+ECONOMY_SUMMARY_CHARS = 240
+# Longest a single LLM attempt may take. The SDK's retries are kept while another
+# attempt still fits before the stage deadline, so 429s and timeouts get retried
+# early on without running past the deadline near the end
+ATTEMPT_TIMEOUT = float(getattr(settings, "LLM_ATTEMPT_TIMEOUT_SECONDS", 60))
+# Room left for the SDK's backoff between attempts
+RETRY_BACKOFF_SECONDS = 2.0
+
+SUMMARY = "summary"
+PLACEMENT = "placement"
+
+
+class SortBudget:
+    """
+    Time budget for one sort. Deadlines are on the monotonic clock.
+    """
+
+    def __init__(self, seconds: float = DEFAULT_DEADLINE, clock=time.monotonic):
+        self.seconds = seconds
+        self.clock = clock
+        self.started = clock()
+        self.end = self.started + seconds
+        self.reserve = min(RESERVE_SECONDS, RESERVE_SHARE * seconds)
+        self.summary_deadline = self.sort_deadline = self.end - self.reserve
+        self.economy = False
+        self.degraded: Dict[str, set] = {SUMMARY: set(), PLACEMENT: set()}
+
+    @classmethod
+    def from_value(cls, value) -> "SortBudget":
+        """
+        Builds a budget from a request's `deadline` (seconds from now).
+        Missing means the default; values are clamped to what the worker allows.
+        Raises ValueError for anything that isn't a number.
+        """
+        if value in (None, ""):
+            return cls(min(DEFAULT_DEADLINE, MAX_DEADLINE))
+        seconds = float(value)
+        if not math.isfinite(seconds):
+            raise ValueError(value)
+        return cls(min(max(seconds, MIN_DEADLINE), MAX_DEADLINE))
+
+    def remaining(self, deadline: Optional[float] = None) -> float:
+        return max(0.0, (deadline if deadline is not None else self.end) - self.clock())
+
+    def stage_remaining(self, stage: str) -> float:
+        return self.remaining(self.summary_deadline if stage == SUMMARY else self.sort_deadline)
+
+    def attempt_timeout(self, stage: str) -> float:
+        return max(1.0, min(ATTEMPT_TIMEOUT, self.stage_remaining(stage)))
+
+    def retries(self, stage: str, default: int) -> int:
+        """
+        How many SDK retries (at most `default`) still fit before the stage deadline.
+        """
+        attempts = int(self.stage_remaining(stage) // (self.attempt_timeout(stage) + RETRY_BACKOFF_SECONDS))
+        return max(0, min(default, attempts - 1))
+
+    def summaries_open(self) -> bool:
+        return self.clock() < self.summary_deadline
+
+    def sorting_open(self) -> bool:
+        return self.clock() < self.sort_deadline
+
+    def models(self, tiers: List[str]) -> List[str]:
+        return tiers[:1] if self.economy else tiers
+
+    def shorten(self, summaries: Dict[str, str]) -> Dict[str, str]:
+        if not self.economy:
+            return summaries
+        return {
+            uid: text if len(text) <= ECONOMY_SUMMARY_CHARS else text[:ECONOMY_SUMMARY_CHARS].rstrip() + "…"
+            for uid, text in summaries.items()
+        }
+
+    def mark(self, part: str, user_id: str):
+        self.degraded[part].add(user_id)
+
+    def plan(
+        self,
+        members: int,
+        batch_plan: BatchPlan,
+        pending_summaries: int = 0,
+        summary_concurrency: int = 1,
+        concurrent_batches: bool = True,
+    ) -> BatchPlan:
+        """
+        Fits the remaining work into the time left: sets the stage deadlines and
+        economy mode, and returns the batch plan to sort with.
+        """
+        now = self.clock()
+        available = max(0.0, self.end - self.reserve - now)
+
+        summary_est = math.ceil(pending_summaries / max(1, summary_concurrency)) * EST_SUMMARY_SECONDS
+
+        def round_est(batch_size: int) -> float:
+            if not members:
+                return 0.0
+            return EST_SORT_BASE_SECONDS + EST_SORT_SECONDS_PER_MEMBER * min(batch_size, members)
+
+        def sort_est(batch_size: int, concurrency: int) -> float:
+            rounds = math.ceil(math.ceil(members / batch_size) / concurrency)
+            return rounds * round_est(batch_size)
+
+        batch_size = batch_plan.batch_size
+        concurrency = batch_plan.concurrency if concurrent_batches else 1
+
+        if summary_est + sort_est(batch_size, concurrency) > available:
+            self.economy = True
+            options = [
+                (size, level)
+                for size in {batch_size, *(s for s in ECONOMY_BATCH_SIZES if s < batch_size)}
+                for level in ({concurrency, max(concurrency, MAX_BATCH_CONCURRENCY)} if concurrent_batches else {1})
+            ]
+            batch_size, concurrency = min(options, key=lambda o: (sort_est(*o), -o[0], o[1]))
+
+        sort_time = sort_est(batch_size, concurrency)
+        total_est = summary_est + sort_time
+        if total_est <= available:
+            # Both stages fit: split the slack in proportion
+            summary_time = available * summary_est / total_est if total_est else 0.0
+        else:
+            # Sorting comes first: it keeps at least one round of batches (and its
+            # share of the estimate); summaries get what is left
+            sort_time = min(available, max(round_est(batch_size), available * sort_time / total_est))
+            summary_time = available - sort_time
+        self.summary_deadline = now + summary_time
+        self.sort_deadline = self.end - self.reserve
+
+        expected = dict(batch_plan.expected)
+        if self.economy:
+            expected = {}  # tuned for a different setting
+        return BatchPlan(members, batch_size, concurrency, expected)
+
+    def flags(self, user_id: str) -> str:
+        """
+        Comma-separated degraded parts for one member ("" when fully LLM-processed).
+        """
+        return ",".join(part for part in (SUMMARY, PLACEMENT) if user_id in self.degraded[part])
+
+    def report(self) -> Dict:
+        return {
+            "deadline_s": self.seconds,
+            "elapsed_s": round(self.clock() - self.started, 3),
+            "economy": self.economy,
+            "degraded_summaries": len(self.degraded[SUMMARY]),
+            "degraded_placements": len(self.degraded[PLACEMENT]),
+        }
+
+    def header(self) -> str:
+        """
+        Compact form for the X-Sort-Degraded response header.
+        """
+        parts = [f"{part}={len(ids)}" for part, ids in self.degraded.items() if ids]
+        if self.economy:
+            parts.append("economy")
+        return "; ".join(parts) or "none"
@@ -0,0 +1,204 @@
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from django.conf import settings
+
+# Model cascade: cheap-first summarization and sorting with escalation.
+#
+# - Short answers skip the LLM and are passed through as their own summary.
+# - Everything else starts on the first (cheapest) model of the stage's tier list.
+# - A call that fails, or a sort batch that fails validation or comes back with
+#   low confidence, is retried on the next tier.
+#
+# Per-tier calls, latency, tokens, cost and escalation rate are accumulated in
+# `cascade_stats` (worker totals) and in the stats of the sort that made them
+# (`track_cascade`), so the mix can be tuned against rate limits.
+
+def _model_list(value, default: List[str]) -> List[str]:
+    if not value:
+        return default
+    if isinstance(value, str):
+        value = value.split(",")
+    return [model.strip() for model in value if model.strip()]
+
+SUMMARY_MODELS = _model_list(getattr(settings, "LLM_SUMMARY_MODELS", None), ["gpt-4o-mini", "gpt-4o"])
+SORT_MODELS = _model_list(getattr(settings, "LLM_SORT_MODELS", None), ["gpt-4o-mini", "gpt-4o"])
+
+# Answers with at most this many characters of content are summarized locally
+SUMMARY_PASSTHROUGH_CHARS = getattr(settings, "SUMMARY_PASSTHROUGH_CHARS", 160)
+
+# Sort batches whose mean self-reported confidence is below this are escalated
+SORT_MIN_CONFIDENCE = getattr(settings, "SORT_MIN_CONFIDENCE", 0.6)
+
+# USD per 1M (input, output) tokens
+MODEL_PRICES = getattr(settings, "LLM_MODEL_PRICES", {
+    "gpt-4o-mini": (0.15, 0.60),
+    "gpt-4o": (2.50, 10.00),
+    "gpt-3.5-turbo": (0.50, 1.50),
+})
+
+
+def is_passthrough(content_parts: List[str]) -> bool:
+    return sum(len(part) for part in content_parts) <= SUMMARY_PASSTHROUGH_CHARS
+
+
+def local_summary(content_parts: List[str]) -> str:
+    """
+    Summary for short responses: the answers themselves, without the form field labels.
+    """
+    answers = [part.split(": ", 1)[-1] for part in content_parts]
+    return "- " + "; ".join(answers)
+
+
+def validate_assignments(
+    batch: Dict[str, str],
+    result: Dict[str, Dict],
+    complete: bool,
+    group_names: Optional[List[str]] = None,
+) -> Tuple[bool, str]:
+    """
+    Checks a sort result before accepting it from a cheaper tier.
+    Returns (ok, reason).
+    """
+    if not complete:
+        return False, "response was cut off"
+
+    missing = set(batch) - set(result)
+    if missing:
+        return False, f"{len(missing)} users unassigned"
+
+    families = [entry.get("family") for entry in result.values() if isinstance(entry, dict)]
+    if len(families) < len(result) or not all(isinstance(f, str) and f.strip() for f in families):
+        return False, "entries without a family"
+
+    if group_names:
+        unknown = set(families) - set(group_names)
+        if unknown:
+            return False, f"unknown groups {sorted(unknown)}"
+
+    confidences = [
+        entry["confidence"] for entry in result.values()
+        if isinstance(entry, dict) and isinstance(entry.get("confidence"), (int, float))
+    ]
+    if confidences:
+        mean_confidence = sum(confidences) / len(confidences)
+        if mean_confidence < SORT_MIN_CONFIDENCE:
+            return False, f"low confidence ({mean_confidence:.2f})"
+
+    return True, ""
+
+
+class CascadeStats:
+    """
+    Thread-safe counters for the cascade, per stage and per model.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.stages: Dict[str, Dict[str, int]] = {}
+            self.models: Dict[str, Dict[str, float]] = {}
+
+    def _stage(self, stage: str) -> Dict[str, int]:
+        return self.stages.setdefault(stage, {"units": 0, "passthrough": 0, "escalations": 0})
+
+    def record_unit(self, stage: str):
+        with self._lock:
+            self._stage(stage)["units"] += 1
+
+    def record_passthrough(self, stage: str):
+        with self._lock:
+            self._stage(stage)["passthrough"] += 1
+
+    def record_escalation(self, stage: str):
+        with self._lock:
+            self._stage(stage)["escalations"] += 1
+
+    def record_call(self, model: str, latency: float, usage=None, failed: bool = False):
+        prompt_tokens = getattr(usage, "prompt_tokens", 0) or 0
+        completion_tokens = getattr(usage, "completion_tokens", 0) or 0
+        input_price, output_price = MODEL_PRICES.get(model, (0.0, 0.0))
+
+        with self._lock:
+            tier = self.models.setdefault(model, {
+                "calls": 0, "failures": 0, "latency": 0.0,
+                "prompt_tokens": 0, "completion_tokens": 0, "cost": 0.0,
+            })
+            tier["calls"] += 1
+            tier["failures"] += int(failed)
+            tier["latency"] += latency
+            tier["prompt_tokens"] += prompt_tokens
+            tier["completion_tokens"] += completion_tokens
+            tier["cost"] += (prompt_tokens * input_price + completion_tokens * output_price) / 1_000_000
+
+    def snapshot(self) -> Dict:
+        with self._lock:
+            return {
+                "stages": {
+                    stage: {
+                        **counts,
+                        "escalation_rate": round(counts["escalations"] / counts["units"], 3) if counts["units"] else 0.0,
+                    }
+                    for stage, counts in self.stages.items()
+                },
+                "models": {
+                    model: {
+                        "calls": int(tier["calls"]),
+                        "failures": int(tier["failures"]),
+                        "avg_latency": round(tier["latency"] / tier["calls"], 3) if tier["calls"] else 0.0,
+                        "prompt_tokens": int(tier["prompt_tokens"]),
+                        "completion_tokens": int(tier["completion_tokens"]),
+                        "cost_usd": round(tier["cost"], 4),
+                    }
+                    for model, tier in self.models.items()
+                },
+            }
+
+# Stats of the sorts running in the current context, innermost last
+_tracked: ContextVar[Tuple[CascadeStats, ...]] = ContextVar("cascade_tracked", default=())
+
+
+class WorkerCascadeStats(CascadeStats):
+    """
+    Totals for the worker's lifetime. Every record is also added to the stats
+    opened with `track_cascade` in the current context.
+    """
+
+    def record_unit(self, stage: str):
+        for stats in (super(), *_tracked.get()):
+            stats.record_unit(stage)
+
+    def record_passthrough(self, stage: str):
+        for stats in (super(), *_tracked.get()):
+            stats.record_passthrough(stage)
+
+    def record_escalation(self, stage: str):
+        for stats in (super(), *_tracked.get()):
+            stats.record_escalation(stage)
+
+    def record_call(self, model: str, latency: float, usage=None, failed: bool = False):
+        for stats in (super(), *_tracked.get()):
+            stats.record_call(model, latency, usage, failed)
+
+
+@contextmanager
+def track_cascade() -> Iterator[CascadeStats]:
+    """
+    Counts the cascade activity of one sort (or bulk sort) apart from the rest of
+    the worker: yields a CascadeStats that receives everything recorded in this
+    context (and the tasks started from it) until the block exits.
+    """
+    stats = CascadeStats()
+    token = _tracked.set(_tracked.get() + (stats,))
+    try:
+        yield stats
+    finally:
+        _tracked.reset(token)
+
+
+cascade_stats = WorkerCascadeStats()
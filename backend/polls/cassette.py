@@ -0,0 +1,305 @@
+import asyncio
+import gzip
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from types import SimpleNamespace
+from typing import Dict, List, Optional, Tuple
+
+from django.conf import settings
+
+# Record/replay layer for LLM calls.
+#
+# record: every chat completion goes to the real client and the response is
+#         appended to a gzip JSON-lines cassette.
+# replay: responses are served from the cassette without touching the network,
+#         optionally sleeping to simulate the recorded (or a fixed) latency.
+#
+# Pseudonymization hands out fresh UUIDs on every run, so requests are keyed on
+# a canonical form where each UUID is replaced by its order of first appearance.
+# Responses are stored in the same canonical form and mapped back on replay.
+
+UUID_PATTERN = re.compile(r"[0-9a-fA-F]{8}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{12}")
+PLACEHOLDER_PATTERN = re.compile(r"<uuid:(\d+)>")
+
+RECORD = "record"
+REPLAY = "replay"
+
+
+class CassetteMiss(KeyError):
+    """Raised in replay mode when a request was never recorded."""
+
+
+def _canonicalize(messages: List[Dict]) -> Tuple[List[Dict], Dict[str, str]]:
+    """
+    Replaces every UUID in the message contents with a `<uuid:N>` placeholder.
+    Returns the canonical messages and the UUID -> placeholder mapping.
+    """
+    mapping: Dict[str, str] = {}
+
+    def substitute(match):
+        value = match.group(0).lower()
+        if value not in mapping:
+            mapping[value] = f"<uuid:{len(mapping)}>"
+        return mapping[value]
+
+    canonical = [
+        {**message, "content": UUID_PATTERN.sub(substitute, message.get("content") or "")}
+        for message in messages
+    ]
+    return canonical, mapping
+
+
+def _encode(text: str, mapping: Dict[str, str]) -> str:
+    return UUID_PATTERN.sub(lambda m: mapping.get(m.group(0).lower(), m.group(0)), text)
+
+
+def _decode(text: str, mapping: Dict[str, str]) -> str:
+    reverse = {placeholder: value for value, placeholder in mapping.items()}
+    return PLACEHOLDER_PATTERN.sub(lambda m: reverse.get(m.group(0), m.group(0)), text)
+
+
+def _completion(content: str, model: str, usage: Optional[Dict] = None):
+    """
+    Builds a minimal object shaped like an OpenAI ChatCompletion.
+    """
+    return SimpleNamespace(
+        model=model,
+        choices=[SimpleNamespace(message=SimpleNamespace(role="assistant", content=content), finish_reason="stop")],
+        usage=SimpleNamespace(**usage) if usage else None,
+    )
+
+
+def _completion_chunks(content: str, model: str, usage: Optional[Dict] = None, size: int = 64):
+    """
+    Splits a recorded response into objects shaped like streamed ChatCompletionChunks.
+    """
+    for start in range(0, len(content), size):
+        yield SimpleNamespace(
+            model=model,
+            choices=[SimpleNamespace(delta=SimpleNamespace(content=content[start:start + size]), finish_reason=None)],
+            usage=None,
+        )
+    yield SimpleNamespace(
+        model=model,
+        choices=[SimpleNamespace(delta=SimpleNamespace(content=None), finish_reason="stop")],
+        usage=SimpleNamespace(**usage) if usage else None,
+    )
+
+
+def _chunk_text(chunk) -> str:
+    if not getattr(chunk, "choices", None):
+        return ""
+    return chunk.choices[0].delta.content or ""
+
+
+def _usage_dict(usage) -> Optional[Dict]:
+    return usage.model_dump() if hasattr(usage, "model_dump") else None
+
+
+class LLMCassette:
+    def __init__(self, path: str, mode: str = REPLAY, latency=None):
+        """
+        `latency` is None (no delay), a number of seconds, or "recorded"
+        to replay each response after the latency it was recorded with.
+        """
+        if mode not in (RECORD, REPLAY):
+            raise ValueError(f"Unknown cassette mode '{mode}'. Use '{RECORD}' or '{REPLAY}'.")
+
+        self.path = path
+        self.mode = mode
+        self.latency = latency
+        self.entries: Dict[str, Dict] = {}
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self.load()
+
+    @staticmethod
+    def key(model: str, messages: List[Dict], temperature) -> str:
+        payload = json.dumps(
+            {"model": model, "messages": messages, "temperature": temperature},
+            sort_keys=True, ensure_ascii=False,
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def load(self):
+        if not os.path.exists(self.path):
+            return
+        with gzip.open(self.path, "rt", encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    entry = json.loads(line)
+                    self.entries[entry["key"]] = entry
+
+    def _append(self, entry: Dict):
+        with self._lock:
+            self.entries[entry["key"]] = entry
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            # Each append adds a gzip member; gzip readers treat them as one stream
+            with gzip.open(self.path, "at", encoding="utf-8") as f:
+                f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+
+    def _replay_delay(self, entry: Dict) -> float:
+        if self.latency == "recorded":
+            return entry.get("latency_ms", 0) / 1000
+        return float(self.latency or 0)
+
+    def _lookup(self, key: str) -> Dict:
+        entry = self.entries.get(key)
+        if entry is None:
+            self.misses += 1
+            raise CassetteMiss(f"No recorded response for request {key[:12]} in {self.path}")
+        self.hits += 1
+        return entry
+
+    def _record_entry(self, key: str, model: str, content: str, usage, mapping: Dict[str, str], latency_ms: float):
+        self._append({
+            "key": key,
+            "model": model,
+            "content": _encode(content, mapping),
+            "usage": _usage_dict(usage),
+            "latency_ms": round(latency_ms, 1),
+        })
+
+    def _request_key(self, kwargs) -> Tuple[str, str, Dict[str, str]]:
+        model = kwargs.get("model")
+        canonical, mapping = _canonicalize(kwargs.get("messages", []))
+        return model, self.key(model, canonical, kwargs.get("temperature")), mapping
+
+    def _record_stream(self, stream, key, model, mapping, started):
+        parts, usage = [], None
+        for chunk in stream:
+            parts.append(_chunk_text(chunk))
+            usage = getattr(chunk, "usage", None) or usage
+            yield chunk
+        self._record_entry(key, model, "".join(parts), usage, mapping, (time.perf_counter() - started) * 1000)
+
+    async def _arecord_stream(self, stream, key, model, mapping, started):
+        parts, usage = [], None
+        async for chunk in stream:
+            parts.append(_chunk_text(chunk))
+            usage = getattr(chunk, "usage", None) or usage
+            yield chunk
+        self._record_entry(key, model, "".join(parts), usage, mapping, (time.perf_counter() - started) * 1000)
+
+    def create(self, inner, **kwargs):
+        model, key, mapping = self._request_key(kwargs)
+
+        if self.mode == REPLAY:
+            entry = self._lookup(key)
+            delay = self._replay_delay(entry)
+            if delay:
+                time.sleep(delay)
+            content = _decode(entry["content"], mapping)
+            if kwargs.get("stream"):
+                return _completion_chunks(content, model, entry.get("usage"))
+            return _completion(content, model, entry.get("usage"))
+
+        started = time.perf_counter()
+        response = inner.chat.completions.create(**kwargs)
+        if kwargs.get("stream"):
+            return self._record_stream(response, key, model, mapping, started)
+        self._record_entry(
+            key, model, response.choices[0].message.content or "", response.usage, mapping,
+            (time.perf_counter() - started) * 1000,
+        )
+        return response
+
+    async def acreate(self, inner, **kwargs):
+        model, key, mapping = self._request_key(kwargs)
+
+        if self.mode == REPLAY:
+            entry = self._lookup(key)
+            delay = self._replay_delay(entry)
+            if delay:
+                await asyncio.sleep(delay)
+            content = _decode(entry["content"], mapping)
+            if kwargs.get("stream"):
+                return _aiter(_completion_chunks(content, model, entry.get("usage")))
+            return _completion(content, model, entry.get("usage"))
+
+        started = time.perf_counter()
+        response = await inner.chat.completions.create(**kwargs)
+        if kwargs.get("stream"):
+            return self._arecord_stream(response, key, model, mapping, started)
+        self._record_entry(
+            key, model, response.choices[0].message.content or "", response.usage, mapping,
+            (time.perf_counter() - started) * 1000,
+        )
+        return response
+
+    def wrap(self, inner=None):
+        """
+        Returns a client exposing `chat.completions.create` backed by this cassette.
+        `inner` is the real OpenAI client; it may be None in replay mode.
+        """
+        return _CassetteClient(self, inner, is_async=False)
+
+    def wrap_async(self, inner=None):
+        return _CassetteClient(self, inner, is_async=True)
+
+
+async def _aiter(items):
+    for item in items:
+        yield item
+
+
+class _CassetteCompletions:
+    def __init__(self, cassette: LLMCassette, inner, is_async: bool):
+        self._cassette = cassette
+        self._inner = inner
+        self._is_async = is_async
+
+    def create(self, **kwargs):
+        if self._is_async:
+            return self._cassette.acreate(self._inner, **kwargs)
+        return self._cassette.create(self._inner, **kwargs)
+
+
+class _CassetteClient:
+    def __init__(self, cassette: LLMCassette, inner, is_async: bool):
+        self.cassette = cassette
+        self._inner = inner
+        self._is_async = is_async
+        self.chat = SimpleNamespace(completions=_CassetteCompletions(cassette, inner, is_async))
+
+    def with_options(self, **options):
+        # Same as OpenAI's `with_options`; options only matter when recording
+        inner = self._inner.with_options(**options) if self._inner is not None else None
+        return _CassetteClient(self.cassette, inner, self._is_async)
+
+
+_default_cassette: Optional[LLMCassette] = None
+
+
+def cassette_from_settings() -> Optional[LLMCassette]:
+    """
+    Returns the process-wide cassette configured by LLM_CASSETTE_PATH, or None.
+    """
+    global _default_cassette
+    path = getattr(settings, "LLM_CASSETTE_PATH", None)
+    if not path:
+        return None
+    if _default_cassette is None:
+        _default_cassette = LLMCassette(
+            path,
+            mode=getattr(settings, "LLM_CASSETTE_MODE", REPLAY),
+            latency=getattr(settings, "LLM_CASSETTE_LATENCY", None),
+        )
+    return _default_cassette
+
+
+def wrap_client(inner, is_async: bool = False):
+    """
+    Wraps an OpenAI client with the configured cassette, if any.
+    """
+    cassette = cassette_from_settings()
+    if cassette is None:
+        return inner
+    return cassette.wrap_async(inner) if is_async else cassette.wrap(inner)
@@ -0,0 +1,109 @@
+import hashlib
+import threading
+from datetime import timedelta
+from typing import Dict, Iterable
+
+from django.conf import settings
+from django.utils import timezone
+
+from .models import SortCheckpoint
+
+# Checkpointed, resumable sort jobs.
+#
+# A job is identified by the uploaded file's bytes plus the instruction. Its
+# pseudonymization maps, every finished summary and every finished sort batch
+# are saved server-side as they complete. If the worker dies, re-submitting the
+# same sheet reuses the same UUIDs and only redoes the units that never finished.
+
+# Flush summaries to the database every this many completions
+SUMMARY_FLUSH_EVERY = getattr(settings, "SORT_CHECKPOINT_FLUSH_EVERY", 25)
+# Abandoned checkpoints (they hold real names) are purged after this long
+CHECKPOINT_TTL = timedelta(hours=getattr(settings, "SORT_CHECKPOINT_TTL_HOURS", 24))
+
+
+def upload_key(content: bytes, instruction: str) -> str:
+    digest = hashlib.sha256(content)
+    digest.update(b"\0")
+    digest.update(instruction.encode("utf-8"))
+    return digest.hexdigest()
+
+
+def batch_key(user_ids: Iterable[str]) -> str:
+    """
+    Identifies a sort batch by its members, so results survive a change of batch size.
+    """
+    return hashlib.sha256("|".join(sorted(user_ids)).encode("utf-8")).hexdigest()
+
+
+class SortJob:
+    """
+    Wraps one SortCheckpoint row. Recording methods are thread-safe; summaries are
+    buffered and written every SUMMARY_FLUSH_EVERY completions, batches immediately.
+    """
+
+    def __init__(self, checkpoint: SortCheckpoint, resumed: bool):
+        self.checkpoint = checkpoint
+        self.resumed = resumed
+        self._lock = threading.Lock()
+        self._unflushed = 0
+
+    @classmethod
+    def open(cls, content: bytes, instruction: str) -> "SortJob":
+        SortCheckpoint.objects.filter(updated_at__lt=timezone.now() - CHECKPOINT_TTL).delete()
+        checkpoint, created = SortCheckpoint.objects.get_or_create(job_key=upload_key(content, instruction))
+        return cls(checkpoint, resumed=not created)
+
+    @property
+    def name_to_uuid(self) -> Dict[str, str]:
+        return dict(self.checkpoint.name_to_uuid)
+
+    @property
+    def unmatched_map(self) -> Dict[str, str]:
+        return dict(self.checkpoint.unmatched_map)
+
+    @property
+    def summaries(self) -> Dict[str, str]:
+        return dict(self.checkpoint.summaries)
+
+    @property
+    def batches(self) -> Dict[str, Dict]:
+        return dict(self.checkpoint.batch_results)
+
+    def _save(self, *fields):
+        SortCheckpoint.objects.filter(pk=self.checkpoint.pk).update(
+            updated_at=timezone.now(),
+            **{field: getattr(self.checkpoint, field) for field in fields},
+        )
+
+    def save_maps(self, name_to_uuid: Dict[str, str], unmatched_map: Dict[str, str]):
+        with self._lock:
+            self.checkpoint.name_to_uuid = dict(name_to_uuid)
+            self.checkpoint.unmatched_map = dict(unmatched_map)
+            self._save("name_to_uuid", "unmatched_map")
+
+    def record_summary(self, user_id: str, summary: str):
+        if summary == "[summary failed]":
+            return  # retry this member on resume
+        with self._lock:
+            self.checkpoint.summaries[user_id] = summary
+            self._unflushed += 1
+            if self._unflushed >= SUMMARY_FLUSH_EVERY:
+                self._save("summaries")
+                self._unflushed = 0
+
+    def record_batch(self, key: str, result: Dict):
+        with self._lock:
+            self.checkpoint.batch_results[key] = result
+            self._save("batch_results")
+
+    def flush(self):
+        with self._lock:
+            if self._unflushed:
+                self._save("summaries")
+                self._unflushed = 0
+
+    def finish(self):
+        """
+        The job completed: drop its checkpoint and the name maps with it.
+        """
+        SortCheckpoint.objects.filter(pk=self.checkpoint.pk).delete()
@@ -0,0 +1,120 @@
+import asyncio
+import hashlib
+import threading
+from concurrent.futures import Future
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+# Single-flight request coalescing.
+#
+# Double-clicked submits and retries after a slow response start identical sorts
+# side by side. Requests are keyed by the upload, the instruction, the access key,
+# the device id and the deadline; while one computation for a key is running,
+# later requests with the same key wait for it and get its result instead of
+# starting their own. Followers never check the access key themselves, so
+# everything the check looks at has to be part of the flight key; the deadline is
+# part of it so nobody waits past their own deadline or gets a result degraded
+# for a shorter one.
+#
+# Flights live in worker memory: identical requests that land on different
+# gunicorn workers are not coalesced (the sort checkpoint still lets the
+# second one reuse whatever the first has finished).
+
+
+def flight_key(
+    upload_key: str, access_key: Optional[str], device_id: Optional[str] = None, deadline: Optional[float] = None
+) -> str:
+    parts = (upload_key, access_key or "", device_id or "", "" if deadline is None else f"{deadline:g}")
+    return hashlib.sha256("\0".join(parts).encode("utf-8")).hexdigest()
+
+
+class _Flight:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error: Optional[BaseException] = None
+        self.followers = 0
+
+
+class SingleFlight:
+    """
+    Thread-based coalescing for sync views.
+    `do(key, compute)` returns (result, shared); `shared` is True for requests that
+    attached to another request's computation. Errors are raised to every caller.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._flights: Dict[str, _Flight] = {}
+
+    def do(self, key: str, compute: Callable[[], Any]) -> Tuple[Any, bool]:
+        with self._lock:
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight()
+            else:
+                flight.followers += 1
+
+        if not leader:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.result, True
+
+        try:
+            flight.result = compute()
+        except BaseException as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                self._flights.pop(key, None)
+            flight.done.set()
+            if flight.followers:
+                print(f"🔗 {flight.followers} duplicate request(s) shared one sort.")
+
+        return flight.result, False
+
+
+class AsyncSingleFlight:
+    """
+    Asyncio version of `SingleFlight` for async views.
+    The computation runs as its own task, so a caller that disconnects (and is
+    cancelled) does not cancel it for the others. Its outcome is published through
+    a `concurrent.futures.Future`, since async views under WSGI each run on their
+    own event loop and a follower cannot await a task from another loop.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._flights: Dict[str, Future] = {}
+
+    async def do(self, key: str, compute: Callable[[], Awaitable[Any]]) -> Tuple[Any, bool]:
+        with self._lock:
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = Future()
+
+        if not leader:
+            return await asyncio.shield(asyncio.wrap_future(flight)), True
+
+        task = asyncio.ensure_future(compute())
+        task.add_done_callback(lambda done: self._settle(key, flight, done))
+        return await asyncio.shield(task), False
+
+    def _settle(self, key: str, flight: Future, task: asyncio.Task):
+        with self._lock:
+            if self._flights.get(key) is flight:
+                del self._flights[key]
+        if task.cancelled():
+            flight.set_exception(RuntimeError("The shared sort was cancelled."))
+        elif task.exception() is not None:
+            flight.set_exception(task.exception())
+        else:
+            flight.set_result(task.result())
+
+
+# Per-worker registries used by the sort views
+sort_flights = SingleFlight()
+async_sort_flights = AsyncSingleFlight()
@@ -0,0 +1,225 @@
+import math
+import re
+from collections import Counter
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+
+from .cohort import STOPWORDS
+
+# Local group-quality metric for sort results.
+#
+# Summaries are embedded as TF-IDF vectors (no model calls). A grouping scores well
+# when members of the same family read alike (high intra-group similarity) and
+# different families read differently (low inter-group similarity), and when the
+# people members asked to be placed with end up in their family.
+
+TOKEN_PATTERN = re.compile(r"[a-z][a-z0-9']+")
+UUID_PATTERN = re.compile(r"\b[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}\b")
+
+
+def _tokens(text: str) -> List[str]:
+    return [t for t in TOKEN_PATTERN.findall(str(text).lower()) if t not in STOPWORDS]
+
+
+def family_of(entry) -> str:
+    """
+    Sort results map user_id to {"family": ..., "notes": ...}; older callers use plain names.
+    """
+    if isinstance(entry, dict):
+        return str(entry.get("family", "")).strip()
+    return str(entry or "").strip()
+
+
+class SummaryVectorizer:
+    """
+    Minimal TF-IDF vectorizer over member summaries. Rows are L2-normalized,
+    so a dot product is a cosine similarity.
+    """
+
+    def __init__(self, max_features: int = 2000):
+        self.max_features = max_features
+        self.vocabulary: Dict[str, int] = {}
+        self.idf = np.zeros(0, dtype=np.float32)
+
+    def fit(self, texts: Iterable[str]) -> "SummaryVectorizer":
+        documents = [set(_tokens(text)) for text in texts]
+        doc_freq = Counter(token for tokens in documents for token in tokens)
+        kept = sorted(doc_freq, key=lambda t: (-doc_freq[t], t))[:self.max_features]
+
+        self.vocabulary = {token: idx for idx, token in enumerate(kept)}
+        total = len(documents)
+        self.idf = np.array(
+            [math.log((1 + total) / (1 + doc_freq[token])) + 1 for token in kept], dtype=np.float32
+        )
+        return self
+
+    def transform(self, texts: Iterable[str]) -> np.ndarray:
+        texts = list(texts)
+        matrix = np.zeros((len(texts), len(self.vocabulary)), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for token, count in Counter(_tokens(text)).items():
+                col = self.vocabulary.get(token)
+                if col is not None:
+                    matrix[row, col] = count
+
+        matrix *= self.idf
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        np.divide(matrix, norms, out=matrix, where=norms > 0)
+        return matrix
+
+    def fit_transform(self, texts: Iterable[str]) -> np.ndarray:
+        texts = list(texts)
+        return self.fit(texts).transform(texts)
+
+
+def preferences_from_frame(df, columns: List[str]) -> Dict[str, List[str]]:
+    """
+    Reads each member's requested partners (already replaced by UUIDs during cleaning)
+    from the given columns of a cleaned frame.
+    """
+    preferences: Dict[str, List[str]] = {}
+    columns = [c for c in columns if c in df.columns and c != "user_id"]
+    if not columns:
+        return preferences
+
+    for user_id, cells in zip(df["user_id"].astype(str), df[columns].astype(str).itertuples(index=False)):
+        wanted = {uid for cell in cells for uid in UUID_PATTERN.findall(cell.lower())}
+        wanted.discard(user_id)
+        if user_id and wanted:
+            preferences[user_id] = sorted(wanted)
+    return preferences
+
+
+def cohesion_score(
+    summaries: Dict[str, str],
+    family_map: Dict[str, object],
+    preferences: Optional[Dict[str, List[str]]] = None,
+) -> Dict:
+    """
+    Scores a grouping. Returns a dict with:
+      intra / inter: mean cosine similarity of summary pairs within / across families
+      separation: (intra - inter) / intra, clipped to [0, 1]
+      preference_satisfaction: share of requested partners placed in the same family
+      score: mean of separation and preference_satisfaction (separation alone
+             when nobody stated preferences)
+    """
+    families = {uid: family_of(entry) for uid, entry in family_map.items()}
+    members = [
+        uid for uid in summaries
+        if families.get(uid) and summaries[uid] != "[summary failed]"
+    ]
+
+    report = {
+        "members": len(members),
+        "groups": len({families[uid] for uid in members}),
+        "intra": 0.0,
+        "inter": 0.0,
+        "separation": 0.0,
+        "preference_satisfaction": None,
+        "score": 0.0,
+    }
+
+    if len(members) >= 2:
+        vectors = SummaryVectorizer().fit_transform(summaries[uid] for uid in members)
+        similarity = vectors @ vectors.T
+        labels = np.array([families[uid] for uid in members])
+        same = labels[:, None] == labels[None, :]
+        np.fill_diagonal(same, False)
+        different = labels[:, None] != labels[None, :]
+
+        intra = float(similarity[same].mean()) if same.any() else 0.0
+        inter = float(similarity[different].mean()) if different.any() else 0.0
+        report["intra"] = round(intra, 4)
+        report["inter"] = round(inter, 4)
+        report["separation"] = round(min(1.0, max(0.0, (intra - inter) / intra)) if intra > 0 else 0.0, 4)
+
+    pairs = satisfied = 0
+    for uid, wanted in (preferences or {}).items():
+        if uid not in families:
+            continue
+        for other in wanted:
+            if other in families:
+                pairs += 1
+                satisfied += int(families[other] == families[uid])
+    if pairs:
+        report["preference_satisfaction"] = round(satisfied / pairs, 4)
+
+    parts = [report["separation"]]
+    if report["preference_satisfaction"] is not None:
+        parts.append(report["preference_satisfaction"])
+    report["score"] = round(sum(parts) / len(parts), 4)
+    return report
+
+
+def _farthest_first(vectors: np.ndarray, count: int) -> List[int]:
+    seeds = [0]
+    closest = vectors @ vectors[0]
+    while len(seeds) < count:
+        candidate = int(np.argmin(closest))
+        if candidate in seeds:
+            break
+        seeds.append(candidate)
+        closest = np.maximum(closest, vectors @ vectors[candidate])
+    return seeds
+
+
+def place_by_similarity(
+    summaries: Dict[str, str],
+    family_map: Dict[str, object],
+    user_ids: List[str],
+    group_names: Optional[List[str]] = None,
+    group_size: int = 10,
+) -> Dict[str, Dict]:
+    """
+    Assigns `user_ids` to families without model calls, in the same
+    {"family", "notes", "confidence"} shape the sort returns.
+
+    Each member joins the existing family whose centroid is closest to their summary
+    (members with an empty summary join the smallest family). When nothing was sorted
+    yet, members are split into `group_names` (or groups of about `group_size`)
+    around mutually dissimilar seeds, keeping group sizes even.
+    """
+    if not user_ids:
+        return {}
+
+    families = {uid: family_of(entry) for uid, entry in family_map.items() if family_of(entry)}
+    sorted_ids = [uid for uid in summaries if uid in families]
+
+    vectorizer = SummaryVectorizer().fit(summaries.get(uid, "") for uid in list(sorted_ids) + list(user_ids))
+    vectors = vectorizer.transform(summaries.get(uid, "") for uid in user_ids)
+    counts: Counter = Counter(families[uid] for uid in sorted_ids)
+
+    if sorted_ids:
+        names = sorted(counts)
+        sorted_vectors = vectorizer.transform(summaries[uid] for uid in sorted_ids)
+        labels = np.array([names.index(families[uid]) for uid in sorted_ids])
+        centroids = np.stack([sorted_vectors[labels == idx].mean(axis=0) for idx in range(len(names))])
+        capacity = None
+    else:
+        count = len(group_names) if group_names else max(1, math.ceil(len(user_ids) / group_size))
+        names = list(group_names) if group_names else [f"Group {idx + 1}" for idx in range(count)]
+        seeds = _farthest_first(vectors, min(count, len(user_ids)))
+        centroids = np.zeros((len(names), vectors.shape[1]), dtype=np.float32)
+        centroids[:len(seeds)] = vectors[seeds]
+        capacity = math.ceil(len(user_ids) / len(names))
+
+    norms = np.linalg.norm(centroids, axis=1, keepdims=True)
+    np.divide(centroids, norms, out=centroids, where=norms > 0)
+    similarity = vectors @ centroids.T
+
+    placed = {}
+    for row, uid in enumerate(user_ids):
+        order = np.argsort(-similarity[row], kind="stable")
+        if not similarity[row].any():
+            order = sorted(range(len(names)), key=lambda idx: counts[names[idx]])
+        if capacity is not None:
+            order = [idx for idx in order if counts[names[idx]] < capacity] or list(order)
+        family = names[int(order[0])]
+        counts[family] += 1
+        placed[uid] = {
+            "family": family,
+            "notes": "Placed locally by summary similarity (deadline).",
+            "confidence": round(float(max(similarity[row].max(), 0.0)), 3),
+        }
+    return placed
@@ -0,0 +1,118 @@
+import hashlib
+import re
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import pandas as pd
+from django.conf import settings
+
+# Cohort-level boilerplate stripping.
+#
+# Google Form exports repeat the full question text in every member's prompt, and
+# many multiple-choice questions get the same answer from most of the cohort.
+# Before prompts are built, each free-text column is profiled once:
+#   - long headers are replaced by a short, stable key derived from the question
+#   - the answer given by at least DOMINANT_SHARE of the cohort is treated as
+#     low-information and dropped; members who answered differently keep theirs
+
+# Headers longer than this are abbreviated
+MAX_LABEL_CHARS = getattr(settings, "PROMPT_MAX_LABEL_CHARS", 24)
+# Share of the cohort giving the same answer for it to count as boilerplate
+DOMINANT_SHARE = getattr(settings, "PROMPT_DOMINANT_SHARE", 0.8)
+# Don't judge "most respondents" on tiny sheets
+MIN_RESPONDENTS = getattr(settings, "PROMPT_MIN_RESPONDENTS", 5)
+
+# Rough chars-per-token ratio for English prompts
+CHARS_PER_TOKEN = 4
+
+STOPWORDS = {
+    "a", "an", "and", "are", "as", "at", "be", "but", "by", "can", "do", "does", "for", "from",
+    "have", "how", "if", "in", "is", "it", "just", "me", "my", "of", "on", "or", "our", "please",
+    "so", "that", "the", "there", "this", "to", "us", "want", "was", "we", "what", "when", "where",
+    "which", "who", "why", "will", "with", "would", "you", "your",
+}
+
+
+def short_key(header: str, max_chars: int = MAX_LABEL_CHARS) -> str:
+    """
+    Abbreviates a question to a stable snake_case key from its first significant words,
+    e.g. "What are your hobbies outside of class?" -> "hobbies_outside_class".
+    """
+    words = re.findall(r"[a-z0-9]+", header.lower())
+    significant = [w for w in words if w not in STOPWORDS and len(w) > 1] or words or ["field"]
+
+    key = ""
+    for word in significant:
+        candidate = f"{key}_{word}" if key else word
+        if len(candidate) > max_chars:
+            break
+        key = candidate
+    return key or significant[0][:max_chars]
+
+
+class CohortProfile:
+    """
+    Per-column prompt settings for one cleaned sheet, plus the estimated savings.
+    """
+
+    def __init__(self):
+        self.labels: Dict[str, str] = {}
+        self.dominant: Dict[str, str] = {}
+        self.chars_before = 0
+        self.chars_after = 0
+
+    def label(self, column: str) -> str:
+        return self.labels.get(column, column)
+
+    def dropped_value(self, column: str) -> Optional[str]:
+        return self.dominant.get(column)
+
+    def report(self) -> Dict:
+        tokens_before = self.chars_before // CHARS_PER_TOKEN
+        tokens_after = self.chars_after // CHARS_PER_TOKEN
+        return {
+            "abbreviated_columns": {label: column for column, label in self.labels.items() if label != column},
+            "low_information_columns": sorted(self.label(column) for column in self.dominant),
+            "est_tokens_before": tokens_before,
+            "est_tokens_after": tokens_after,
+            "savings_pct": round(100 * (1 - tokens_after / tokens_before), 1) if tokens_before else 0.0,
+        }
+
+
+def profile_columns(answers: Iterable[Tuple[str, pd.Series]]) -> CohortProfile:
+    """
+    Builds a CohortProfile from (column, usable answers) pairs
+    (trimmed strings, None where the cell never reaches a prompt).
+    Only counts are kept, so `answers` can yield one column at a time.
+    """
+    profile = CohortProfile()
+    used_keys: Dict[str, str] = {}
+
+    for column, values in answers:
+        label = column
+        if len(column) > MAX_LABEL_CHARS:
+            label = short_key(column)
+            if label in used_keys and used_keys[label] != column:
+                label = f"{label}_{hashlib.sha1(column.encode('utf-8')).hexdigest()[:4]}"
+        used_keys[label] = column
+        profile.labels[column] = label
+
+        present = values.dropna()
+        if present.empty:
+            continue
+
+        dominant = None
+        if len(present) >= MIN_RESPONDENTS:
+            counts = present.value_counts()
+            # Share of the whole cohort, not just of those who answered: a rare answer
+            # to an optional question is information, not boilerplate
+            if counts.iloc[0] / len(values) >= DOMINANT_SHARE:
+                dominant = counts.index[0]
+                profile.dominant[column] = dominant
+
+        lengths = present.str.len()
+        profile.chars_before += int(lengths.sum()) + len(present) * (len(column) + 2)
+
+        kept = lengths[present != dominant] if dominant is not None else lengths
+        profile.chars_after += int(kept.sum()) + len(kept) * (len(label) + 2)
+
+    return profile
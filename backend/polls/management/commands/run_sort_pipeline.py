@@ -0,0 +1,88 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from openai import OpenAI
+from django.conf import settings
+
+from polls import services
+from polls.cascade import cascade_stats
+from polls.cassette import LLMCassette, RECORD, REPLAY
+from polls.views import PREFERENCE_COLUMNS, TIMESTAMP_COLUMN
+
+
+class Command(BaseCommand):
+    help = (
+        "Runs the full sort pipeline on a spreadsheet with LLM calls recorded to, "
+        "or replayed from, a cassette. Prints per-stage timings."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("sheet", help="Path to the .csv/.xlsx export to sort.")
+        parser.add_argument("--cassette", required=True, help="Cassette file (gzip JSON lines).")
+        parser.add_argument("--mode", choices=[RECORD, REPLAY], default=REPLAY)
+        parser.add_argument(
+            "--latency", default=None,
+            help='Replay delay per call: seconds, or "recorded" to use the recorded latency.',
+        )
+        parser.add_argument("--instruction", default="Group people by similar vibes, energy, or common interests.")
+        parser.add_argument("--batch-size", type=int, default=40)
+        parser.add_argument("--output", default=None, help="Optional path for the sorted CSV.")
+
+    def handle(self, *args, **options):
+        import pandas as pd
+
+        cassette = LLMCassette(options["cassette"], mode=options["mode"], latency=options["latency"])
+        inner = OpenAI(api_key=settings.OPENAI_API_KEY) if options["mode"] == RECORD else None
+        services.client = cassette.wrap(inner)
+
+        timings = {}
+
+        def timed(stage, func, *args, **kwargs):
+            started = time.perf_counter()
+            result = func(*args, **kwargs)
+            timings[stage] = time.perf_counter() - started
+            return result
+
+        sheet = options["sheet"]
+        if sheet.endswith(".csv"):
+            df = timed("parse", pd.read_csv, sheet)
+        elif sheet.endswith((".xls", ".xlsx")):
+            df = timed("parse", pd.read_excel, sheet)
+        else:
+            raise CommandError("Unsupported file type. Use .csv, .xls or .xlsx.")
+
+        cleaned_df, uuid_map, name_to_uuid, unmatched_map, pii_columns = timed(
+            "clean", services.clean_and_prepare_dataframe,
+            df, timestamp_column=TIMESTAMP_COLUMN, preference_columns=PREFERENCE_COLUMNS,
+        )
+        profile = timed("profile", services.build_cohort_profile, cleaned_df)
+        summaries = timed(
+            "summarize", services.run_preprocessing_pipeline,
+            services.iter_member_contents(cleaned_df, profile=profile),
+        )
+        family_map = timed(
+            "sort", services.sort_users_with_gpt, summaries, options["instruction"], options["batch_size"]
+        )
+
+        if options["output"]:
+            cleaned_df["summary"] = cleaned_df["user_id"].map(summaries)
+            cleaned_df["family"] = cleaned_df["user_id"].apply(lambda uid: family_map.get(str(uid).strip(), ""))
+            timed("write", cleaned_df.to_csv, options["output"], index=False)
+
+        self.stdout.write(f"Members: {len(cleaned_df)}  sorted: {len(family_map)}")
+        for stage, seconds in timings.items():
+            self.stdout.write(f"  {stage:<10} {seconds * 1000:9.1f} ms")
+        self.stdout.write(f"Prompt stripping: {profile.report()}")
+        self.stdout.write(f"Cassette {cassette.mode}: {cassette.hits} hits, {cassette.misses} misses")
+
+        stats = cascade_stats.snapshot()
+        for stage, counts in stats["stages"].items():
+            self.stdout.write(
+                f"  {stage:<10} units {counts['units']}  passthrough {counts['passthrough']}  "
+                f"escalation rate {counts['escalation_rate']:.1%}"
+            )
+        for model, tier in stats["models"].items():
+            self.stdout.write(
+                f"  {model:<14} calls {tier['calls']}  failures {tier['failures']}  "
+                f"avg {tier['avg_latency'] * 1000:.0f} ms  ${tier['cost_usd']:.4f}"
+            )
@@ -0,0 +1,186 @@
+import asyncio
+import json
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from polls import async_services, services
+from polls.cascade import track_cascade
+from polls.cassette import LLMCassette, RECORD, REPLAY
+from polls.cohesion import cohesion_score, preferences_from_frame
+from polls.views import PREFERENCE_COLUMNS, TIMESTAMP_COLUMN
+
+
+def _int_list(value: str):
+    try:
+        return sorted({int(v) for v in value.split(",") if v.strip()})
+    except ValueError:
+        raise CommandError(f"Expected comma-separated integers, got {value!r}.")
+
+
+class Command(BaseCommand):
+    help = (
+        "Sorts a sheet with several batch sizes and concurrency levels, scores each "
+        "grouping with the local cohesion metric and writes the batch tuning table "
+        "used at runtime (SORT_BATCH_TUNING_FILE)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("sheet", help="Path to the .csv/.xlsx export to tune on.")
+        parser.add_argument("--output", default="batch_tuning.json", help="Where to write the tuning table.")
+        parser.add_argument("--batch-sizes", default="20,30,40,60", help="Comma-separated batch sizes to try.")
+        parser.add_argument("--concurrency", default="1,2,4", help="Comma-separated batch concurrency levels to try.")
+        parser.add_argument(
+            "--sizes", default=None,
+            help="Comma-separated sheet sizes (member counts) to tune for; the sheet is "
+                 "truncated to each size. Defaults to the full sheet.",
+        )
+        parser.add_argument("--repeats", type=int, default=1, help="Runs per setting; results are averaged.")
+        parser.add_argument("--instruction", default="Group people by similar vibes, energy, or common interests.")
+        parser.add_argument("--max-failure-rate", type=float, default=0.05,
+                            help="Settings whose sort calls failed more often than this are not chosen.")
+        parser.add_argument("--score-tolerance", type=float, default=0.02,
+                            help="Among settings scoring within this of the best, the fastest wins.")
+        parser.add_argument("--cassette", default=None, help="Optional LLM cassette (gzip JSON lines).")
+        parser.add_argument("--mode", choices=[RECORD, REPLAY], default=RECORD)
+
+    def handle(self, *args, **options):
+        if options["repeats"] < 1:
+            raise CommandError("--repeats must be at least 1.")
+
+        if options["cassette"]:
+            from openai import AsyncOpenAI
+
+            cassette = LLMCassette(options["cassette"], mode=options["mode"])
+            inner = AsyncOpenAI(api_key=settings.OPENAI_API_KEY) if options["mode"] == RECORD else None
+            async_services.async_client = cassette.wrap_async(inner)
+
+        report = asyncio.run(self._tune(options))
+
+        with open(options["output"], "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+        self.stdout.write("Chosen settings:")
+        for row in report["table"]:
+            limit = row["max_members"] if row["max_members"] is not None else "any"
+            self.stdout.write(
+                f"  up to {limit:>5} members: batch_size {row['batch_size']:>3}  concurrency {row['concurrency']}  "
+                f"score {row['score']:.3f}  latency {row['latency_s']:.1f}s  failures {row['failure_rate']:.1%}"
+            )
+        self.stdout.write(self.style.SUCCESS(f"Wrote {options['output']}"))
+
+    async def _tune(self, options):
+        import pandas as pd
+
+        sheet = options["sheet"]
+        if sheet.endswith(".csv"):
+            df = pd.read_csv(sheet)
+        elif sheet.endswith((".xls", ".xlsx")):
+            df = pd.read_excel(sheet)
+        else:
+            raise CommandError("Unsupported file type. Use .csv, .xls or .xlsx.")
+
+        cleaned_df, uuid_map, name_to_uuid, unmatched_map, pii_columns = services.clean_and_prepare_dataframe(
+            df, timestamp_column=TIMESTAMP_COLUMN, preference_columns=PREFERENCE_COLUMNS
+        )
+        profile = services.build_cohort_profile(cleaned_df)
+        summaries = await async_services.arun_preprocessing_pipeline(
+            services.iter_member_contents(cleaned_df, profile=profile)
+        )
+        preferences = preferences_from_frame(cleaned_df, PREFERENCE_COLUMNS)
+        user_ids = list(summaries)
+
+        sizes = _int_list(options["sizes"]) if options["sizes"] else [len(user_ids)]
+        sizes = sorted({min(size, len(user_ids)) for size in sizes if size > 0})
+        batch_sizes = _int_list(options["batch_sizes"])
+        concurrency_levels = _int_list(options["concurrency"])
+
+        trials, table = [], []
+        for size in sizes:
+            subset = {uid: summaries[uid] for uid in user_ids[:size]}
+            size_trials = []
+
+            for batch_size in self._distinct_batch_sizes(batch_sizes, size):
+                batches = -(-size // batch_size)
+                for concurrency in concurrency_levels:
+                    if concurrency > batches and concurrency != concurrency_levels[0]:
+                        continue  # same as a lower level: there aren't enough batches
+                    trial = await self._trial(subset, preferences, batch_size, concurrency, options)
+                    trial.update(members=size, batches=batches)
+                    size_trials.append(trial)
+                    self.stdout.write(
+                        f"  {size:>5} members  batch_size {batch_size:>3}  concurrency {concurrency}  "
+                        f"score {trial['score']:.3f}  latency {trial['latency_s']:.1f}s  "
+                        f"failures {trial['failure_rate']:.1%}  unsorted {trial['unsorted']:.1%}"
+                    )
+
+            trials.extend(size_trials)
+            table.append(self._choose(size_trials, size, options))
+
+        table[-1]["max_members"] = None
+        return {
+            "generated_at": timezone.now().isoformat(),
+            "sheet": sheet,
+            "instruction": options["instruction"],
+            "table": table,
+            "trials": trials,
+        }
+
+    @staticmethod
+    def _distinct_batch_sizes(batch_sizes, size):
+        # Every batch size >= the sheet size is the same single batch; try it once
+        distinct = [b for b in batch_sizes if b < size]
+        covering = [b for b in batch_sizes if b >= size]
+        if covering:
+            distinct.append(covering[0])
+        return distinct
+
+    async def _trial(self, summaries, preferences, batch_size, concurrency, options):
+        runs = []
+        for _ in range(options["repeats"]):
+            started = time.perf_counter()
+            with track_cascade() as trial_cascade:
+                result = await async_services.asort_users_with_gpt(
+                    summaries, options["instruction"], batch_size=batch_size, concurrency=concurrency
+                )
+            latency = time.perf_counter() - started
+
+            models = trial_cascade.snapshot()["models"].values()
+            calls = sum(tier["calls"] for tier in models)
+            failures = sum(tier["failures"] for tier in models)
+            cohesion = cohesion_score(summaries, result, preferences)
+            runs.append({
+                "latency_s": latency,
+                "failure_rate": failures / calls if calls else 0.0,
+                "unsorted": len(set(summaries) - set(result)) / len(summaries) if summaries else 0.0,
+                "score": cohesion["score"],
+                "separation": cohesion["separation"],
+                "preference_satisfaction": cohesion["preference_satisfaction"] or 0.0,
+            })
+
+        trial = {"batch_size": batch_size, "concurrency": concurrency}
+        for name in runs[0]:
+            trial[name] = round(sum(run[name] for run in runs) / len(runs), 4)
+        return trial
+
+    @staticmethod
+    def _choose(trials, size, options):
+        reliable = [t for t in trials if t["failure_rate"] <= options["max_failure_rate"]] or trials
+        # Cohesion only counts placed members, so a setting that left members
+        # unsorted can look better than one that placed everybody
+        fewest_unsorted = min(t["unsorted"] for t in reliable)
+        complete = [t for t in reliable if t["unsorted"] == fewest_unsorted]
+        best_score = max(t["score"] for t in complete)
+        close = [t for t in complete if t["score"] >= best_score - options["score_tolerance"]]
+        chosen = min(close, key=lambda t: (t["latency_s"], -t["score"]))
+        return {
+            "max_members": size,
+            "tuned_members": size,
+            "batch_size": chosen["batch_size"],
+            "concurrency": chosen["concurrency"],
+            "score": chosen["score"],
+            "latency_s": chosen["latency_s"],
+            "failure_rate": chosen["failure_rate"],
+        }
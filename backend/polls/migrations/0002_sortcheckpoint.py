@@ -0,0 +1,26 @@
+# Generated by Django 5.2.1 on 2026-10-19 16:09
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('polls', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SortCheckpoint',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('job_key', models.CharField(max_length=64, unique=True)),
+                ('name_to_uuid', models.JSONField(blank=True, default=dict)),
+                ('unmatched_map', models.JSONField(blank=True, default=dict)),
+                ('summaries', models.JSONField(blank=True, default=dict)),
+                ('batch_results', models.JSONField(blank=True, default=dict)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+    ]
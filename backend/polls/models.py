@@ -18,4 +18,17 @@ class AccessKey(models.Model):
     @property
     def can_be_used(self):
         return self.usage_count < self.usage_limit and not self.is_expired
-        
\ No newline at end of file
+        
+class SortCheckpoint(models.Model):
+    """
+    Server-side progress of a sort job so a killed worker can resume it.
+    Holds the pseudonymization maps (real names), so it is never exposed through
+    the API or admin and is deleted as soon as the job completes.
+    """
+    job_key = models.CharField(max_length=64, unique=True)
+    name_to_uuid = models.JSONField(default=dict, blank=True)
+    unmatched_map = models.JSONField(default=dict, blank=True)
+    summaries = models.JSONField(default=dict, blank=True)
+    batch_results = models.JSONField(default=dict, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
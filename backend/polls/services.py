@@ -1,15 +1,37 @@
 import uuid
 import re
 import pandas as pd
-from typing import List, Dict
+from typing import List, Dict, Iterable, Iterator, Tuple, Callable, Optional
 import os
-from openai import OpenAI
 from django.conf import settings
 import json
 import csv
-
-# OpenAI API Key
-client = OpenAI(api_key=settings.OPENAI_API_KEY)
+from .cassette import wrap_client
+from .streaming import AssignmentStreamParser
+from .cohort import CohortProfile, profile_columns
+from .checkpoints import batch_key
+from .budget import PLACEMENT, SUMMARY, SortBudget
+from .cohesion import family_of, place_by_similarity
+from .cascade import (
+    SUMMARY_MODELS,
+    SORT_MODELS,
+    cascade_stats,
+    is_passthrough,
+    local_summary,
+    validate_assignments,
+)
+import time
+
+# OpenAI client, built on first use (see get_client) so importing this module stays cheap.
+# Tools may assign a replacement (e.g. a cassette-backed client) before running the pipeline.
+client = None
+
+def get_client():
+    global client
+    if client is None:
+        from openai import OpenAI
+        client = wrap_client(OpenAI(api_key=settings.OPENAI_API_KEY))
+    return client
 
 # Keywords to identify PII columns
 
@@ -60,10 +82,15 @@ def deduplicate_responses(df: pd.DataFrame, timestamp_column: str = 'timestamp')
     return df
 
 # Step 3: Pseudonymize by assigning UUIDs and storing name mapping
-def pseudonymize_and_generate_uuid(df: pd.DataFrame):
+def pseudonymize_and_generate_uuid(df: pd.DataFrame, known_uuids: Optional[Dict[str, str]] = None):
+    """
+    `known_uuids` (normalized name -> UUID) is reused first, so a resumed job
+    assigns the same UUIDs as its earlier run.
+    """
     uuid_map = {}
     name_to_uuid = {}
     user_ids = []
+    known_uuids = known_uuids or {}
 
     # Normalize and collect all names first
     name_series = df["First and Last Name"].fillna("").astype(str)
@@ -71,7 +98,7 @@ def pseudonymize_and_generate_uuid(df: pd.DataFrame):
 
     for norm_name in normalized_names.unique():
         if norm_name:
-            uid = str(uuid.uuid4())
+            uid = known_uuids.get(norm_name) or str(uuid.uuid4())
             name_to_uuid[norm_name] = uid
             uuid_map[uid] = {"name": norm_name}
 
@@ -94,8 +121,8 @@ def is_uuid(string):
     except ValueError:
         return False
 
-def replace_names_with_uuids(df: pd.DataFrame, name_to_uuid: Dict[str, str], columns_to_check: List[str]):
-    unmatched_map = {}  # cache to reuse manual UUIDs for unmatched values
+def replace_names_with_uuids(df: pd.DataFrame, name_to_uuid: Dict[str, str], columns_to_check: List[str], known_manual: Optional[Dict[str, str]] = None):
+    unmatched_map = dict(known_manual or {})  # cache to reuse manual UUIDs for unmatched values
 
     for col in columns_to_check:
         if col not in df.columns:
@@ -131,8 +158,9 @@ def replace_names_with_uuids(df: pd.DataFrame, name_to_uuid: Dict[str, str], col
     return df, unmatched_map
 
 # EOF Column Encryption
-def encrypt_manual_column(df: pd.DataFrame, column_name: str):
+def encrypt_manual_column(df: pd.DataFrame, column_name: str, known_manual: Optional[Dict[str, str]] = None):
     manual_encryption_map = {}
+    known_manual = known_manual or {}
 
     if column_name not in df.columns:
         print(f"⚠️ Column '{column_name}' not found for encryption.")
@@ -141,7 +169,7 @@ def encrypt_manual_column(df: pd.DataFrame, column_name: str):
     for idx, val in df[column_name].items():
         if isinstance(val, str) and val.strip():  # only encrypt non-empty text
             if val not in manual_encryption_map:
-                manual_encryption_map[val] = f"manual-{str(uuid.uuid4())}"
+                manual_encryption_map[val] = known_manual.get(val) or f"manual-{str(uuid.uuid4())}"
             df.at[idx, column_name] = manual_encryption_map[val]
         else:
             df.at[idx, column_name] = ""
@@ -149,15 +177,25 @@ def encrypt_manual_column(df: pd.DataFrame, column_name: str):
     return df, manual_encryption_map
 
 # Main pipeline entrypoint
-def clean_and_prepare_dataframe(df: pd.DataFrame, timestamp_column: str, preference_columns: List[str]):
+def clean_and_prepare_dataframe(
+    df: pd.DataFrame,
+    timestamp_column: str,
+    preference_columns: List[str],
+    known_uuids: Optional[Dict[str, str]] = None,
+    known_manual: Optional[Dict[str, str]] = None,
+):
+    """
+    `known_uuids` / `known_manual` are maps saved by an earlier run of the same job;
+    passing them makes pseudonymization reproduce that run's UUIDs.
+    """
     df.columns = [col.strip().replace("\n", " ").replace("\r", " ").strip() for col in df.columns]
     df = deduplicate_responses(df, timestamp_column)
-    df, uuid_map, name_to_uuid, pii_columns = pseudonymize_and_generate_uuid(df)
-    df, unmatched_map = replace_names_with_uuids(df, name_to_uuid, preference_columns)
+    df, uuid_map, name_to_uuid, pii_columns = pseudonymize_and_generate_uuid(df, known_uuids)
+    df, unmatched_map = replace_names_with_uuids(df, name_to_uuid, preference_columns, known_manual)
 
     # Encrypt "End of Form" free response
     extra_column = "Is there anything else you want us to know? (This is the end of the form!)"
-    df, extra_manual_map = encrypt_manual_column(df, extra_column)
+    df, extra_manual_map = encrypt_manual_column(df, extra_column, known_manual)
 
     # Merge both manual maps
     unmatched_map.update(extra_manual_map)
@@ -188,77 +226,261 @@ def save_manual_uuid_map(unmatched_map: Dict[str, str], filepath="manual_uuid_ma
 # ---- Start of AI Pipeline ----
 
 # Step 1: Pre-Processing
-def run_preprocessing_pipeline(members: List[Dict]) -> Dict[str, str]:
-    summaries = {}
+def _text_column_mask(df: pd.DataFrame) -> List[str]:
+    """
+    Returns the columns that can hold free-text answers (object/string dtype),
+    excluding `user_id`. Numeric, boolean and datetime columns never reach the prompt.
+    """
+    return [
+        col for col in df.columns
+        if col != "user_id" and (pd.api.types.is_object_dtype(df[col]) or pd.api.types.is_string_dtype(df[col]))
+    ]
 
-    for member in members:
-        user_id = member.get("user_id")
-        if not user_id:
-            continue
+def _is_uuid_series(values: pd.Series) -> pd.Series:
+    """
+    Vectorized equivalent of `is_uuid` for a Series of strings.
+    """
+    hex_digits = (
+        values.str.replace("urn:", "", regex=False)
+        .str.replace("uuid:", "", regex=False)
+        .str.strip("{}")
+        .str.replace("-", "", regex=False)
+    )
+    return hex_digits.str.fullmatch(r"[0-9a-fA-F]{32}").fillna(False).astype(bool)
 
-        content_parts = []
+def _usable_answers(df: pd.DataFrame, col: str) -> Tuple[pd.Series, pd.Series]:
+    """
+    Returns (trimmed values, usable mask) for one column. A cell is usable when it
+    is non-empty free text that isn't a (manual-)UUID.
+    """
+    col_values = df[col]
+    is_text = col_values.map(lambda v: isinstance(v, str)).astype(bool)
+    trimmed = col_values.where(is_text, "").astype(str).str.strip()
+
+    usable = (
+        is_text
+        & (trimmed != "")
+        & ~trimmed.str.startswith("manual-")
+        & ~_is_uuid_series(trimmed)
+    )
+    return trimmed, usable
+
+def _field_parts(df: pd.DataFrame, col: str, profile: Optional[CohortProfile] = None) -> pd.Series:
+    """
+    Builds the "{field}: {value}" prompt line for every row of one column,
+    or None where the cell is not a usable free-text answer.
+    With a cohort profile, the field is its short label and the cohort's
+    dominant answer is dropped.
+    """
+    trimmed, usable = _usable_answers(df, col)
+    label = col
+
+    if profile is not None:
+        label = profile.label(col)
+        dropped_value = profile.dropped_value(col)
+        if dropped_value is not None:
+            usable &= trimmed != dropped_value
+
+    parts = (label + ": " + trimmed).astype(object)
+    return parts.where(usable, None)
+
+def build_cohort_profile(df: pd.DataFrame) -> CohortProfile:
+    """
+    Profiles the cleaned DataFrame column by column to shorten prompts
+    (see polls/cohort.py). Call before `iter_member_contents`.
+    """
+    def answers():
+        # One column's answers at a time, so peak memory stays at a single column
+        for col in _text_column_mask(df):
+            trimmed, usable = _usable_answers(df, col)
+            yield col, trimmed.astype(object).where(usable, None)
+
+    return profile_columns(answers())
+
+def iter_member_contents(df: pd.DataFrame, chunk_size: int = 256, profile: Optional[CohortProfile] = None) -> Iterator[Tuple[str, List[str]]]:
+    """
+    Yields (user_id, content_parts) for each member straight from the columnar data,
+    without materializing a per-row dict for the whole sheet.
+    Prompt lines are built vectorized, `chunk_size` rows at a time, so extra memory
+    stays bounded no matter how many rows the sheet has. Rows without a user_id are skipped.
+    Pass a profile from `build_cohort_profile` to strip cohort-wide boilerplate.
+    """
+    if "user_id" not in df.columns:
+        return
 
-        for field, val in member.items():
-            if field == "user_id":
+    text_columns = _text_column_mask(df)
+
+    for start in range(0, len(df), chunk_size):
+        chunk = df.iloc[start:start + chunk_size]
+        column_parts = [_field_parts(chunk, col, profile).to_numpy() for col in text_columns]
+
+        for row_idx, user_id in enumerate(chunk["user_id"].to_numpy()):
+            if not user_id or not isinstance(user_id, str):
                 continue
-            if isinstance(val, str):
-                trimmed = val.strip()
-                # Skip UUID-like entries (including manual-UUIDs)
-                if not trimmed or is_uuid(trimmed) or trimmed.startswith("manual-"):
-                    continue
-                content_parts.append(f"{field}: {trimmed}")
-
-        if not content_parts:
-            summaries[user_id] = ""
-            continue
+            content_parts = [parts[row_idx] for parts in column_parts if parts[row_idx] is not None]
+            yield user_id, content_parts
+
+def _build_summary_prompt(content_parts: List[str]) -> str:
+    return (
+        "You are summarizing a user's form responses.\n"
+        "Your goal is to compress the content into 1–2 bullet points **without losing emotional tone or subtle personal preferences.**\n"
+        "Preserve important feelings, intentions, and context even if they seem casual or emotional.\n"
+        "Do not over-formalize or flatten the voice too much.\n\n"
+        + "\n".join(content_parts)
+    )
 
-        prompt = (
-            "You are summarizing a user's form responses.\n"
-            "Your goal is to compress the content into 1–2 bullet points **without losing emotional tone or subtle personal preferences.**\n"
-            "Preserve important feelings, intentions, and context even if they seem casual or emotional.\n"
-            "Do not over-formalize or flatten the voice too much.\n\n"
-            + "\n".join(content_parts)
-        )
+def _call_timeout(budget: Optional[SortBudget], stage: str) -> Dict:
+    # Per-attempt timeout so an in-flight request can't run past its stage deadline
+    if budget is None:
+        return {}
+    return {"timeout": budget.attempt_timeout(stage)}
+
+# The OpenAI SDK's default number of retries
+SDK_MAX_RETRIES = 2
 
+def _budget_client(client, budget: Optional[SortBudget], stage: str):
+    # Keeps the SDK's retries (backoff on 429s and timeouts) while another attempt
+    # still fits before the stage deadline, and drops them once it doesn't
+    if budget is None:
+        return client
+    default = getattr(client, "max_retries", SDK_MAX_RETRIES)
+    retries = budget.retries(stage, default)
+    return client if retries == default else client.with_options(max_retries=retries)
 
+def summarize_member(user_id: str, content_parts: List[str], budget: Optional[SortBudget] = None) -> str:
+    """
+    Summarizes one member through the model cascade: short answers are passed
+    through locally, the rest go to the cheapest summary model and escalate to
+    the next tier only if that call fails or comes back empty.
+    Past the budget's summary deadline the member's own answers are used instead.
+    """
+    if not content_parts:
+        return ""
+
+    cascade_stats.record_unit("summary")
+    if is_passthrough(content_parts):
+        cascade_stats.record_passthrough("summary")
+        return local_summary(content_parts)
+
+    if budget is not None and not budget.summaries_open():
+        budget.mark(SUMMARY, user_id)
+        return local_summary(content_parts)
+
+    prompt = _build_summary_prompt(content_parts)
+    models = budget.models(SUMMARY_MODELS) if budget is not None else SUMMARY_MODELS
+
+    for tier, model in enumerate(models):
+        if tier:
+            cascade_stats.record_escalation("summary")
+        started = time.perf_counter()
         try:
-            response = client.chat.completions.create(
-                model="gpt-3.5-turbo",
+            response = _budget_client(get_client(), budget, SUMMARY).chat.completions.create(
+                model=model,
                 messages=[{"role": "user", "content": prompt}],
                 temperature=0.5,
+                **_call_timeout(budget, SUMMARY),
             )
+            cascade_stats.record_call(model, time.perf_counter() - started, response.usage)
             summary = response.choices[0].message.content.strip()
-            summaries[user_id] = summary
+            if summary:
+                return summary
 
         except Exception as e:
-            print(f"❌ Error summarizing user {user_id}: {e}")
-            summaries[user_id] = "[summary failed]"
+            cascade_stats.record_call(model, time.perf_counter() - started, failed=True)
+            print(f"❌ Error summarizing user {user_id} with {model}: {e}")
 
-    return summaries
+    if budget is not None and not budget.summaries_open():
+        budget.mark(SUMMARY, user_id)
+        return local_summary(content_parts)
 
-# Step 2: Sorting
-def sort_users_with_gpt(summaries: Dict[str, str], instruction: str, batch_size: int = 40) -> Dict[str, str]:
+    return "[summary failed]"
+
+# Called with (user_id, summary) as each summary finishes
+OnSummary = Optional[Callable[[str, str], None]]
+
+def run_preprocessing_pipeline(
+    members: Iterable[Tuple[str, List[str]]],
+    completed: Optional[Dict[str, str]] = None,
+    on_summary: OnSummary = None,
+    budget: Optional[SortBudget] = None,
+) -> Dict[str, str]:
     """
-    Smart wrapper for sorting users with GPT.
-    Uses batch-based sorting if the number of users exceeds batch_size.
+    Summarizes each member's form responses with GPT.
+    `members` is a stream of (user_id, content_parts), e.g. from `iter_member_contents`.
+    Members already in `completed` (from a checkpoint) are not summarized again.
+    Summaries degraded by the `budget` are not passed to `on_summary`.
     """
-    formatted_summaries = {
+    summaries = {}
+    completed = completed or {}
+
+    for user_id, content_parts in members:
+        if not user_id:
+            continue
+        if user_id in completed:
+            summaries[user_id] = completed[user_id]
+            continue
+
+        summaries[user_id] = summarize_member(user_id, content_parts, budget)
+        if on_summary is not None and not (budget is not None and user_id in budget.degraded[SUMMARY]):
+            on_summary(user_id, summaries[user_id])
+
+    return summaries
+
+# Step 2: Sorting
+SORT_SYSTEM_MESSAGE = "You are a friendly, intuitive and reliable AI sorting assistant."
+
+def _sortable_summaries(summaries: Dict[str, str]) -> Dict[str, str]:
+    return {
         user_id: summary
         for user_id, summary in summaries.items()
         if summary.strip() and summary != "[summary failed]"
     }
 
+# Called with (user_id, {"family": ..., "notes": ...}) as each assignment streams in
+OnAssignment = Optional[Callable[[str, Dict], None]]
+# Called with (batch_key, result) when a batch is fully sorted
+OnBatch = Optional[Callable[[str, Dict], None]]
+
+def sort_users_with_gpt(
+    summaries: Dict[str, str],
+    instruction: str,
+    batch_size: int = 40,
+    on_entry: OnAssignment = None,
+    completed_batches: Optional[Dict[str, Dict]] = None,
+    on_batch: OnBatch = None,
+    budget: Optional[SortBudget] = None,
+) -> Dict[str, str]:
+    """
+    Smart wrapper for sorting users with GPT.
+    Uses batch-based sorting if the number of users exceeds batch_size.
+    Batches found in `completed_batches` (keyed by `batch_key`) are reused instead of re-sorted.
+    Batches the `budget` has no time left for are skipped (see `place_unsorted_locally`).
+    """
+    formatted_summaries = _sortable_summaries(summaries)
+
     if len(formatted_summaries) <= batch_size:
         print(f"🔹 Sorting {len(formatted_summaries)} users directly (no batching)...")
-        return sort_users_with_gpt_single_batch(formatted_summaries, instruction)
+        return _sort_checkpointed_batch(formatted_summaries, instruction, on_entry, None, completed_batches, on_batch, budget)
     else:
         print(f"🔸 Sorting {len(formatted_summaries)} users in batches of {batch_size}...")
-        return sort_users_in_batches(formatted_summaries, instruction, batch_size)
+        return sort_users_in_batches(formatted_summaries, instruction, batch_size, on_entry, completed_batches, on_batch, budget)
 
-def sort_users_with_gpt_single_batch(summaries: Dict[str, str], instruction: str) -> Dict[str, str]:
-    """
-    Sends a single batch of summaries to GPT and returns user_id → group mapping.
-    """
+def _batch_done(batch: Dict[str, str], result: Dict) -> bool:
+    # Only fully sorted batches are checkpointed; partial ones are redone on resume
+    return bool(result) and not (set(batch) - set(result))
+
+def _sort_checkpointed_batch(batch, instruction, on_entry, group_names, completed_batches, on_batch, budget=None) -> Dict:
+    key = batch_key(batch)
+    if completed_batches and key in completed_batches:
+        print(f"♻️ Reusing checkpointed result for {len(batch)} users.")
+        return completed_batches[key]
+
+    result = sort_users_with_gpt_single_batch(batch, instruction, on_entry, group_names, budget)
+    if on_batch is not None and _batch_done(batch, result):
+        on_batch(key, result)
+    return result
+
+def _build_sort_prompt(summaries: Dict[str, str], instruction: str) -> str:
     formatted_entries = [
         f"- {user_id}: {summary}"
         for user_id, summary in summaries.items()
@@ -266,7 +488,7 @@ def sort_users_with_gpt_single_batch(summaries: Dict[str, str], instruction: str
 
     instruction = _inject_default_group_count(instruction)
 
-    prompt = (
+    return (
         "You are a personality-based group formation expert.\n"
         "Your job is to create meaningful, compatible groups of people based solely on their summaries and the general instruction provided.\n"
         "Each summary contains emotionally rich clues about the individual's preferences, tone, and interpersonal dynamics.\n"
@@ -293,108 +515,196 @@ def sort_users_with_gpt_single_batch(summaries: Dict[str, str], instruction: str
         "{\n"
         "  \"user_id\": {\n"
         "    \"family\": \"Group A\",\n"
-        "    \"notes\": \"Matched with uuid123 due to shared interests in reflection and quiet hobbies.\"\n"
+        "    \"notes\": \"Matched with uuid123 due to shared interests in reflection and quiet hobbies.\",\n"
+        "    \"confidence\": 0.8\n"
         "  },\n"
         "  ...\n"
         "}\n"
         "You MUST return valid JSON only — no explanation, just the mapping.\n"
         "Make sure every user_id is assigned to one of the group names you use.\n"
         "Each 'notes' entry should be one sentence giving a reason for the assignment — short, meaningful, and human-readable.\n"
-        "If you reference other users in the notes, use their user_id exactly as written."
+        "If you reference other users in the notes, use their user_id exactly as written.\n"
+        "Each 'confidence' is a number from 0 to 1 for how well the person fits their group."
+    )
+
+def _parse_sort_response(content: str) -> Dict:
+    content = content.strip()
+    print("🔍 Raw GPT response:\n", content)
+    cleaned_content = re.sub(r"^```(?:json)?|```$", "", content, flags=re.IGNORECASE).strip()
+
+    result = json.loads(cleaned_content)
+    print("✅ Parsed result:", result)
+    return result
+
+def _sort_request(prompt: str, model: str, budget: Optional[SortBudget] = None) -> Dict:
+    """
+    Chat completion arguments for a sort call: streamed, in JSON mode.
+    """
+    return dict(
+        **_call_timeout(budget, "sort"),
+        model=model,
+        messages=[
+            {"role": "system", "content": SORT_SYSTEM_MESSAGE},
+            {"role": "user", "content": prompt},
+        ],
+        temperature=0.4,
+        response_format={"type": "json_object"},
+        stream=True,
+        stream_options={"include_usage": True},
     )
 
+def _chunk_content(chunk) -> str:
+    if not chunk.choices:
+        return ""
+    return chunk.choices[0].delta.content or ""
+
+def _finish_sort_stream(parser: AssignmentStreamParser, raw_parts: List[str]) -> Tuple[Dict, bool]:
+    """
+    Returns (entries, complete) from what the stream parser collected, falling
+    back to parsing the whole response when nothing could be read incrementally.
+    """
+    if parser.skipped:
+        print(f"⚠️ Dropped {len(parser.skipped)} malformed entries: {parser.skipped}")
+
+    if not parser.entries:
+        return _parse_sort_response("".join(raw_parts)), True
+
+    if not parser.complete:
+        print(f"⚠️ GPT response was cut off; keeping {len(parser.entries)} completed entries.")
+    else:
+        print(f"✅ Parsed {len(parser.entries)} streamed entries.")
+    return parser.entries, parser.complete and not parser.skipped
+
+def _accept_or_escalate(summaries: Dict[str, str], model: str, result: Dict, complete: bool, best: Dict, group_names: Optional[List[str]]) -> Tuple[bool, Dict]:
+    """
+    Validates one tier's sort result. Returns (accepted, best result so far).
+    """
+    ok, reason = validate_assignments(summaries, result, complete, group_names)
+    if ok:
+        return True, result
+    print(f"⚠️ {model} sort result rejected ({reason}).")
+    return False, result if len(result) >= len(best) else best
+
+def _stream_sort(prompt: str, model: str, on_entry: OnAssignment, budget: Optional[SortBudget] = None) -> Tuple[Dict, bool]:
+    parser = AssignmentStreamParser(on_entry=on_entry)
+    raw_parts, usage = [], None
+    started = time.perf_counter()
 
     try:
-        response = client.chat.completions.create(
-            model="gpt-4o",
-            messages=[
-                {
-                    "role": "system",
-                    "content": "You are a friendly, intuitive and reliable AI sorting assistant.",
-                },
-                {"role": "user", "content": prompt},
-            ],
-            temperature=0.4,
-        )
-
-        content = response.choices[0].message.content.strip()
-        print("🔍 Raw GPT response:\n", content)
-        cleaned_content = re.sub(r"^```(?:json)?|```$", "", content.strip(), flags=re.IGNORECASE).strip()
-
-        result = json.loads(cleaned_content)
-        print("✅ Parsed result:", result)
-        return result
+        stream = _budget_client(get_client(), budget, "sort").chat.completions.create(**_sort_request(prompt, model, budget))
+        for chunk in stream:
+            usage = getattr(chunk, "usage", None) or usage
+            text = _chunk_content(chunk)
+            raw_parts.append(text)
+            parser.feed(text)
+            if budget is not None and not budget.sorting_open():
+                print(f"⏰ Sort deadline reached; keeping {len(parser.entries)} streamed entries.")
+                getattr(stream, "close", lambda: None)()
+                cascade_stats.record_call(model, time.perf_counter() - started, usage)
+                return parser.entries, False
+
+        cascade_stats.record_call(model, time.perf_counter() - started, usage)
+        return _finish_sort_stream(parser, raw_parts)
 
     except Exception as e:
-        print("❌ Error during GPT sorting:", e)
+        cascade_stats.record_call(model, time.perf_counter() - started, usage, failed=True)
+        print(f"❌ Error during GPT sorting with {model}:", e)
+        return parser.entries, False
+
+def sort_users_with_gpt_single_batch(
+    summaries: Dict[str, str],
+    instruction: str,
+    on_entry: OnAssignment = None,
+    group_names: Optional[List[str]] = None,
+    budget: Optional[SortBudget] = None,
+) -> Dict[str, str]:
+    """
+    Sends a single batch of summaries to GPT and returns user_id → group mapping.
+    The response is streamed and parsed entry by entry; `on_entry` sees each
+    assignment as it arrives, and a truncated response keeps its completed entries.
+    Starts on the cheapest sort model and escalates while the result fails validation.
+    """
+    if budget is not None and not budget.sorting_open():
+        print(f"⏰ Sort deadline reached; {len(summaries)} users left for local placement.")
         return {}
 
+    prompt = _build_sort_prompt(budget.shorten(summaries) if budget is not None else summaries, instruction)
+    models = budget.models(SORT_MODELS) if budget is not None else SORT_MODELS
+    best = {}
+
+    cascade_stats.record_unit("sort")
+    for tier, model in enumerate(models):
+        if tier:
+            if budget is not None and not budget.sorting_open():
+                break
+            cascade_stats.record_escalation("sort")
+        result, complete = _stream_sort(prompt, model, on_entry, budget)
+        accepted, best = _accept_or_escalate(summaries, model, result, complete, best, group_names)
+        if accepted:
+            break
+
+    return best
+
 # Step 2.1: Batch Sorting
-def sort_users_in_batches(summaries: Dict[str, str], instruction: str, batch_size: int = 40) -> Dict[str, str]:
+def _batch_dict(d: Dict[str, str], size: int):
+    items = list(d.items())
+    for i in range(0, len(items), size):
+        yield dict(items[i:i + size])
+
+def _batch_group_names(instruction: str) -> Tuple[bool, List[str]]:
+    """
+    Detects if the user explicitly asked for a specific number of groups (like "7 groups").
+    Returns (use_custom_groups, group_names) to enforce across batches.
+    """
+    group_count_match = re.search(r"\b([2-9]|1[0-9])\s+groups?\b", instruction.lower())
+    if group_count_match is None:
+        return False, []  # let default logic in prompt handle this
+
+    group_count = int(group_count_match.group(1))
+    return True, [f"Group {chr(ord('A') + i)}" for i in range(group_count)]
+
+def _build_batch_instruction(instruction: str, idx: int, total_batches: int, use_custom_groups: bool, group_names: List[str]) -> str:
+    base = instruction.strip() if use_custom_groups else _inject_default_group_count(instruction)
+    return (
+        f"{base}\n\n"
+        f"You are sorting batch {idx + 1} of {total_batches}. "
+        f"The total number of groups across all batches must be exactly {len(group_names)}.\n"
+        f"Do not create new group names. Only assign participants to the following:\n"
+        + ", ".join(group_names) + "."
+    )
+
+def _report_batch_result(idx: int, batch: Dict[str, str], result: Dict) -> None:
+    # Check for skipped users
+    missing = set(batch) - set(result)
+    if missing:
+        print(f"⚠️ GPT skipped {len(missing)} users in batch {idx + 1}: {missing}")
+
+def sort_users_in_batches(
+    summaries: Dict[str, str],
+    instruction: str,
+    batch_size: int = 40,
+    on_entry: OnAssignment = None,
+    completed_batches: Optional[Dict[str, Dict]] = None,
+    on_batch: OnBatch = None,
+    budget: Optional[SortBudget] = None,
+) -> Dict[str, str]:
     """
     Splits summaries into manageable batches and sorts them using GPT.
     Returns a combined mapping of user_id -> assigned family.
     """
-    import re
-
-    def batch_dict(d: Dict[str, str], size: int):
-        items = list(d.items())
-        for i in range(0, len(items), size):
-            yield dict(items[i:i + size])
-
     full_result = {}
-    batches = list(batch_dict(summaries, batch_size))
+    batches = list(_batch_dict(summaries, batch_size))
     total_batches = len(batches)
 
-    # Detect if user explicitly asked for a specific number of groups
-    group_count_match = re.search(r"\b([2-9]|1[0-9])\s+groups?\b", instruction.lower())
-    use_custom_groups = group_count_match is not None
-
-    if not use_custom_groups:
-        group_count = 5  # <- DEFAULT GROUP COUNT
-        group_names = [f"Group {chr(ord('A') + i)}" for i in range(group_count)]
-
-    # If a number was found (like "7 groups"), we enforce it across batches
-    if use_custom_groups:
-        group_count = int(group_count_match.group(1))
-        group_names = [f"Group {chr(ord('A') + i)}" for i in range(group_count)]
-    else:
-        group_names = []  # let default logic in prompt handle this
+    use_custom_groups, group_names = _batch_group_names(instruction)
 
     for idx, batch in enumerate(batches):
         print(f"\n📦 Sorting batch {idx + 1}/{total_batches} with {len(batch)} users...")
 
-        if use_custom_groups:
-            batch_instruction = (
-                f"{instruction.strip()}\n\n"
-                f"You are sorting batch {idx + 1} of {total_batches}. "
-                f"The total number of groups across all batches must be exactly {len(group_names)}.\n"
-                f"Do not create new group names. Only assign participants to the following:\n"
-                + ", ".join(group_names) + "."
-            )
-        else:
-            batch_instruction = (
-                f"{_inject_default_group_count(instruction)}\n\n"
-                f"You are sorting batch {idx + 1} of {total_batches}. "
-                f"The total number of groups across all batches must be exactly {len(group_names)}.\n"
-                f"Do not create new group names. Only assign participants to the following:\n"
-                + ", ".join(group_names) + "."
-            )
-
-        result = sort_users_with_gpt(batch, batch_instruction)
-
-        if result is None:
-            print(f"❌ GPT failed to return results for batch {idx + 1}. Skipping...")
-            continue
-
-        # Check for skipped users
-        expected = set(batch)
-        received = set(result)
-        missing = expected - received
-
-        if missing:
-            print(f"⚠️ GPT skipped {len(missing)} users in batch {idx + 1}: {missing}")
+        batch_instruction = _build_batch_instruction(instruction, idx, total_batches, use_custom_groups, group_names)
+        result = _sort_checkpointed_batch(batch, batch_instruction, on_entry, group_names, completed_batches, on_batch, budget)
 
+        _report_batch_result(idx, batch, result)
         full_result.update(result)
 
     # Final check for unsorted users
@@ -404,6 +714,28 @@ def sort_users_in_batches(summaries: Dict[str, str], instruction: str, batch_siz
 
     return full_result
 
+# Step 2.2: Local placement of whoever is still unsorted
+def place_unsorted_locally(summaries: Dict[str, str], family_map: Dict, instruction: str, budget: Optional[SortBudget] = None) -> Dict:
+    """
+    Completes an assignment without model calls: every member in `summaries` that has
+    no family yet joins the family whose members' summaries are most similar to theirs.
+    Placed members are marked as degraded on the `budget`.
+    """
+    unsorted = [uid for uid in summaries if uid and not family_of(family_map.get(uid))]
+    if not unsorted:
+        return family_map
+
+    print(f"🧭 Placing {len(unsorted)} unsorted users locally by summary similarity...")
+    use_custom_groups, group_names = _batch_group_names(instruction)
+    texts = {uid: "" if text == "[summary failed]" else text for uid, text in summaries.items()}
+    placed = place_by_similarity(texts, family_map, unsorted, group_names)
+
+    if budget is not None:
+        for uid in placed:
+            budget.mark(PLACEMENT, uid)
+
+    return {**family_map, **placed}
+
 # Step 3: UUID -> Name Translations
 def translate_uuids_to_names_with_preferences(
     sorted_csv_path: str,
@@ -0,0 +1,147 @@
+import json
+from typing import Callable, Dict, List, Optional, Tuple
+
+# Incremental parser for streamed sort responses.
+#
+# The sorter returns one JSON object mapping user_id -> {"family": ..., "notes": ...}.
+# Instead of waiting for the whole completion and calling json.loads on it, the
+# parser walks the characters as they arrive and emits each user's entry as soon
+# as its value closes. A response cut off partway still yields every entry that
+# finished, and a malformed entry only loses that one user: entries whose value
+# doesn't parse, or isn't an object or a group name (null, numbers, booleans,
+# lists), are recorded in `skipped`.
+
+
+class AssignmentStreamParser:
+    def __init__(self, on_entry: Optional[Callable[[str, Dict], None]] = None):
+        self.on_entry = on_entry
+        self.entries: Dict[str, Dict] = {}
+        self.skipped: List[str] = []
+        self.complete = False
+
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._expecting = "key"
+        self._key_chars: List[str] = []
+        self._key: Optional[str] = None
+        self._capturing = False
+        self._scalar = False
+        self._value_chars: List[str] = []
+
+    def feed(self, text: str) -> List[Tuple[str, Dict]]:
+        """
+        Consumes the next piece of the response. Returns the entries completed by it.
+        """
+        emitted = []
+        for ch in text:
+            if self.complete:
+                break
+            entry = self._consume(ch)
+            if entry is not None:
+                emitted.append(entry)
+        return emitted
+
+    def _consume(self, ch: str):
+        # Skip anything before the top-level object (code fences, stray prose)
+        if self._depth == 0:
+            if ch == "{":
+                self._depth = 1
+                self._expecting = "key"
+            return None
+
+        if self._capturing:
+            return self._consume_value(ch)
+
+        # Inside the top-level object, between entries
+        if self._in_string:
+            if self._escape:
+                self._escape = False
+            elif ch == "\\":
+                self._escape = True
+            elif ch == '"':
+                self._in_string = False
+                self._key = json.loads('"' + "".join(self._key_chars) + '"')
+                self._expecting = "colon"
+                return None
+            self._key_chars.append(ch)
+            return None
+
+        if ch.isspace() or ch == ",":
+            return None
+        if ch == '"' and self._expecting == "key":
+            self._in_string = True
+            self._key_chars = []
+        elif ch == ":" and self._expecting == "colon":
+            self._expecting = "value"
+        elif self._expecting == "value" and ch != "}":
+            self._capturing = True
+            self._value_chars = [ch]
+            if ch in "{[":
+                self._depth = 2
+            elif ch == '"':
+                self._in_string = True
+            else:
+                # null, true/false or a number: runs up to the next separator
+                self._scalar = True
+        elif ch == "}":
+            self._depth = 0
+            self.complete = True
+        return None
+
+    def _consume_value(self, ch: str):
+        if self._scalar:
+            if ch not in ",}" and not ch.isspace():
+                self._value_chars.append(ch)
+                return None
+            entry = self._finish_value()
+            if ch == "}":
+                self._depth = 0
+                self.complete = True
+            return entry
+
+        self._value_chars.append(ch)
+
+        if self._in_string:
+            if self._escape:
+                self._escape = False
+            elif ch == "\\":
+                self._escape = True
+            elif ch == '"':
+                self._in_string = False
+                if self._depth == 1:
+                    return self._finish_value()
+            return None
+
+        if ch == '"':
+            self._in_string = True
+        elif ch in "{[":
+            self._depth += 1
+        elif ch in "}]":
+            self._depth -= 1
+            if self._depth == 1:
+                return self._finish_value()
+        return None
+
+    def _finish_value(self):
+        key, raw = self._key, "".join(self._value_chars)
+        self._capturing = False
+        self._scalar = False
+        self._value_chars = []
+        self._expecting = "key"
+
+        try:
+            value = json.loads(raw)
+        except json.JSONDecodeError:
+            self.skipped.append(key)
+            return None
+        if not isinstance(value, (dict, str)):
+            self.skipped.append(key)
+            return None
+
+        # Tolerate the flat {"user_id": "Group A"} shape
+        entry = value if isinstance(value, dict) else {"family": value}
+        self.entries[key] = entry
+        if self.on_entry is not None:
+            self.on_entry(key, entry)
+        return key, entry
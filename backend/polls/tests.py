@@ -1,3 +1,352 @@
-from django.test import TestCase
+import asyncio
+import threading
+import time
+from unittest import mock
 
-# Create your tests here.
+import pandas as pd
+from django.test import SimpleTestCase, TestCase
+
+from .async_services import AsyncRateLimiter
+from . import services
+from .batch_policy import BatchPlan
+from .checkpoints import SortJob, batch_key
+from .budget import EST_SORT_BASE_SECONDS, EST_SORT_SECONDS_PER_MEMBER, SUMMARY, SortBudget
+from .coalesce import AsyncSingleFlight, SingleFlight, flight_key
+from .cohort import profile_columns
+from .models import AccessKey
+from .streaming import AssignmentStreamParser
+from .views import PREFERENCE_COLUMNS, TIMESTAMP_COLUMN, KeyRejected, _use_access_key
+
+
+def _feed_in_pieces(parser, text, size=7):
+    emitted = []
+    for start in range(0, len(text), size):
+        emitted.extend(parser.feed(text[start:start + size]))
+    return emitted
+
+
+class AssignmentStreamParserTests(SimpleTestCase):
+    def test_emits_entries_as_they_close(self):
+        seen = []
+        parser = AssignmentStreamParser(on_entry=lambda key, entry: seen.append(key))
+        text = '{"u1": {"family": "Group A", "notes": "likes {hiking}"}, "u2": {"family": "Group B"}}'
+
+        emitted = _feed_in_pieces(parser, text)
+
+        self.assertEqual([key for key, _ in emitted], ["u1", "u2"])
+        self.assertEqual(seen, ["u1", "u2"])
+        self.assertEqual(parser.entries["u1"]["notes"], "likes {hiking}")
+        self.assertTrue(parser.complete)
+        self.assertEqual(parser.skipped, [])
+
+    def test_skips_code_fences_and_prose(self):
+        parser = AssignmentStreamParser()
+        parser.feed('Here you go:\n```json\n{"u1": {"family": "Group A"}}\n```\nAnything else?')
+
+        self.assertEqual(parser.entries, {"u1": {"family": "Group A"}})
+        self.assertTrue(parser.complete)
+
+    def test_truncated_response_keeps_finished_entries(self):
+        parser = AssignmentStreamParser()
+        parser.feed('{"u1": {"family": "Group A"}, "u2": {"family": "Gro')
+
+        self.assertEqual(list(parser.entries), ["u1"])
+        self.assertFalse(parser.complete)
+
+    def test_malformed_entry_only_loses_that_member(self):
+        parser = AssignmentStreamParser()
+        parser.feed('{"u1": {"family": "Group A",}, "u2": {"family": "Group B"}}')
+
+        self.assertEqual(list(parser.entries), ["u2"])
+        self.assertEqual(parser.skipped, ["u1"])
+        self.assertTrue(parser.complete)
+
+    def test_flat_group_names_are_accepted(self):
+        parser = AssignmentStreamParser()
+        parser.feed('{"u1": "Group A", "u2": "Group \\"B\\""}')
+
+        self.assertEqual(parser.entries, {"u1": {"family": "Group A"}, "u2": {"family": 'Group "B"'}})
+
+    def test_scalar_values_are_skipped_without_losing_sync(self):
+        parser = AssignmentStreamParser()
+        text = '{"a": null, "b": {"family": "Group A"}, "c": 3.5 ,"d": true, "e": [1, 2], "f": {"family": "Group B"}, "g": false}'
+
+        _feed_in_pieces(parser, text, size=3)
+
+        self.assertEqual(parser.entries, {"b": {"family": "Group A"}, "f": {"family": "Group B"}})
+        self.assertEqual(parser.skipped, ["a", "c", "d", "e", "g"])
+        self.assertTrue(parser.complete)
+
+    def test_ignores_text_after_the_object(self):
+        parser = AssignmentStreamParser()
+        parser.feed('{"u1": {"family": "Group A"}}')
+
+        self.assertEqual(parser.feed(' {"u2": {"family": "Group B"}}'), [])
+        self.assertEqual(list(parser.entries), ["u1"])
+
+
+class AsyncRateLimiterTests(SimpleTestCase):
+    def _run_on_loops(self, limiter, loops, calls_per_loop):
+        in_flight, peak, lock = [0], [0], threading.Lock()
+
+        async def call():
+            async with limiter:
+                with lock:
+                    in_flight[0] += 1
+                    peak[0] = max(peak[0], in_flight[0])
+                await asyncio.sleep(0.01)
+                with lock:
+                    in_flight[0] -= 1
+
+        async def many():
+            await asyncio.gather(*(call() for _ in range(calls_per_loop)))
+
+        threads = [threading.Thread(target=asyncio.run, args=(many(),)) for _ in range(loops)]
+        started = time.monotonic()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join(timeout=10)
+        self.assertFalse(any(thread.is_alive() for thread in threads), "limiter deadlocked")
+        return time.monotonic() - started, peak[0]
+
+    def test_caps_in_flight_calls_across_event_loops(self):
+        limiter = AsyncRateLimiter(requests_per_minute=60_000, max_in_flight=2)
+
+        _, peak = self._run_on_loops(limiter, loops=2, calls_per_loop=10)
+
+        self.assertLessEqual(peak, 2)
+
+    def test_rate_is_shared_across_event_loops(self):
+        # 20 calls per second with a burst of 2: 10 calls need at least 0.4s
+        limiter = AsyncRateLimiter(requests_per_minute=1200, max_in_flight=2)
+
+        elapsed, _ = self._run_on_loops(limiter, loops=2, calls_per_loop=5)
+
+        self.assertGreaterEqual(elapsed, 0.35)
+
+
+class SortBudgetTests(SimpleTestCase):
+    def _budget(self, seconds):
+        now = [0.0]
+        budget = SortBudget(seconds, clock=lambda: now[0])
+        return budget, now
+
+    def test_keeps_sdk_retries_while_attempts_fit(self):
+        budget, now = self._budget(540)
+
+        self.assertEqual(budget.retries(SUMMARY, 2), 2)
+        self.assertEqual(budget.attempt_timeout(SUMMARY), 60)
+
+        now[0] = budget.summary_deadline - 100
+        self.assertEqual(budget.retries(SUMMARY, 2), 0)
+
+    def test_short_deadline_keeps_most_of_its_time(self):
+        budget, _ = self._budget(10)
+
+        self.assertEqual(budget.sort_deadline, 9)
+
+    def test_sorting_keeps_a_round_when_the_work_does_not_fit(self):
+        budget, _ = self._budget(10)
+
+        plan = budget.plan(120, BatchPlan(120, 40, 1), pending_summaries=120, concurrent_batches=False)
+
+        self.assertTrue(budget.economy)
+        one_round = EST_SORT_BASE_SECONDS + EST_SORT_SECONDS_PER_MEMBER * plan.batch_size
+        self.assertGreaterEqual(budget.sort_deadline - budget.summary_deadline, min(one_round, 9))
+
+    def test_both_stages_share_the_slack_when_the_work_fits(self):
+        budget, _ = self._budget(540)
+
+        budget.plan(20, BatchPlan(20, 40, 1), pending_summaries=20, summary_concurrency=8)
+
+        self.assertFalse(budget.economy)
+        self.assertGreater(budget.summary_deadline, 0)
+        self.assertLess(budget.summary_deadline, budget.sort_deadline)
+
+    def test_last_attempt_ends_at_the_stage_deadline(self):
+        budget, now = self._budget(12)
+        now[0] = budget.sort_deadline - 4
+
+        self.assertEqual(budget.retries("sort", 2), 0)
+        self.assertEqual(budget.attempt_timeout("sort"), 4)
+
+
+class CohortProfileTests(SimpleTestCase):
+    def test_answer_shared_by_most_of_the_cohort_is_dropped(self):
+        column = "Do you agree to the community guidelines?"
+        answers = pd.Series(["Yes"] * 190 + [None] * 10, dtype=object)
+
+        profile = profile_columns([(column, answers)])
+
+        self.assertEqual(profile.dropped_value(column), "Yes")
+
+    def test_rare_answer_to_an_optional_question_is_kept(self):
+        column = "Any allergies we should know about?"
+        answers = pd.Series(["Severe peanut allergy"] * 6 + [None] * 194, dtype=object)
+
+        profile = profile_columns([(column, answers)])
+
+        self.assertIsNone(profile.dropped_value(column))
+        self.assertEqual(profile.report()["low_information_columns"], [])
+
+
+def _wait_until(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            raise AssertionError("timed out waiting")
+        time.sleep(0.01)
+
+
+class SingleFlightTests(TestCase):
+    def setUp(self):
+        self.flights = SingleFlight()
+        self.key = flight_key("upload", "k1", "device", 540)
+
+    def _with_followers(self, count, compute):
+        # The leader runs on this thread (and its DB connection); followers attach from threads
+        outcomes = []
+
+        def follow():
+            try:
+                outcomes.append(self.flights.do(self.key, lambda: "follower computed"))
+            except Exception as e:
+                outcomes.append(e)
+
+        threads = [threading.Thread(target=follow) for _ in range(count)]
+
+        def lead():
+            for thread in threads:
+                thread.start()
+            _wait_until(lambda: self.flights._flights[self.key].followers == count)
+            return compute()
+
+        try:
+            outcomes.append(self.flights.do(self.key, lead))
+        except Exception as e:
+            outcomes.append(e)
+        for thread in threads:
+            thread.join(timeout=5)
+        return outcomes
+
+    def test_followers_share_the_result_and_the_key_is_charged_once(self):
+        AccessKey.objects.create(key="k1", usage_limit=5)
+
+        outcomes = self._with_followers(2, lambda: _use_access_key("k1", None, "127.0.0.1"))
+
+        self.assertEqual(len({result for result, _ in outcomes}), 1)
+        self.assertEqual(sorted(shared for _, shared in outcomes), [False, True, True])
+        self.assertEqual(AccessKey.objects.get(key="k1").usage_count, 1)
+        self.assertEqual(self.flights._flights, {})
+
+    def test_rejected_key_reaches_every_waiter(self):
+        outcomes = self._with_followers(2, lambda: _use_access_key("unknown", None, "127.0.0.1"))
+
+        self.assertEqual(len(outcomes), 3)
+        for outcome in outcomes:
+            self.assertIsInstance(outcome, KeyRejected)
+            self.assertEqual(outcome.status_code, 403)
+
+    def test_flight_key_separates_devices_and_deadlines(self):
+        base = flight_key("upload", "k1", "device", 540)
+
+        self.assertEqual(base, flight_key("upload", "k1", "device", 540.0))
+        self.assertNotEqual(base, flight_key("upload", "k1", "other-device", 540))
+        self.assertNotEqual(base, flight_key("upload", "k1", "device", 60))
+
+
+class AsyncSingleFlightTests(SimpleTestCase):
+    def test_cancelled_leader_does_not_break_followers(self):
+        async def scenario():
+            flights, release, runs = AsyncSingleFlight(), asyncio.Event(), []
+
+            async def compute():
+                runs.append(1)
+                await release.wait()
+                return "sorted"
+
+            leader = asyncio.ensure_future(flights.do("job", compute))
+            await asyncio.sleep(0)
+            follower = asyncio.ensure_future(flights.do("job", compute))
+            await asyncio.sleep(0)
+            leader.cancel()
+            release.set()
+            return await follower, leader.cancelled(), len(runs)
+
+        self.assertEqual(asyncio.run(scenario()), (("sorted", True), True, 1))
+
+    def test_follower_on_another_event_loop_gets_the_result(self):
+        flights, release, results = AsyncSingleFlight(), threading.Event(), {}
+
+        async def compute():
+            while not release.is_set():
+                await asyncio.sleep(0.01)
+            return "sorted"
+
+        def run(name):
+            results[name] = asyncio.run(flights.do("job", compute))
+
+        leader = threading.Thread(target=run, args=("leader",))
+        leader.start()
+        _wait_until(lambda: "job" in flights._flights)
+        follower = threading.Thread(target=run, args=("follower",))
+        follower.start()
+        time.sleep(0.05)
+        release.set()
+        leader.join(timeout=5)
+        follower.join(timeout=5)
+
+        self.assertEqual(results, {"leader": ("sorted", False), "follower": ("sorted", True)})
+
+
+class SortJobTests(TestCase):
+    SHEET = b"sheet bytes"
+
+    def _frame(self):
+        return pd.DataFrame({
+            TIMESTAMP_COLUMN: ["2025-08-01 12:00:00", "2025-08-01 12:01:00", "2025-08-01 12:02:00"],
+            "First and Last Name": ["Ada Lovelace", "Alan Turing", "Grace Hopper"],
+            "What are your hobbies?": ["Chess and long walks", "Running marathons", "Sailing on weekends"],
+        })
+
+    def _clean(self, job):
+        cleaned_df, _, name_to_uuid, unmatched_map, _ = services.clean_and_prepare_dataframe(
+            self._frame(), timestamp_column=TIMESTAMP_COLUMN, preference_columns=PREFERENCE_COLUMNS,
+            known_uuids=job.name_to_uuid, known_manual=job.unmatched_map,
+        )
+        return cleaned_df, name_to_uuid, unmatched_map
+
+    def test_resumed_job_reuses_uuids_summaries_and_batches(self):
+        job = SortJob.open(self.SHEET, "3 groups")
+        self.assertFalse(job.resumed)
+        cleaned_df, name_to_uuid, unmatched_map = self._clean(job)
+        job.save_maps(name_to_uuid, unmatched_map)
+
+        user_ids = list(cleaned_df["user_id"])
+        job.record_summary(user_ids[0], "- likes chess")
+        job.record_summary(user_ids[1], "[summary failed]")
+        job.flush()
+        batch = {uid: "summary" for uid in user_ids}
+        result = {uid: {"family": "Group A"} for uid in user_ids}
+        job.record_batch(batch_key(batch), result)
+
+        resumed = SortJob.open(self.SHEET, "3 groups")
+        self.assertTrue(resumed.resumed)
+        self.assertEqual(list(self._clean(resumed)[0]["user_id"]), user_ids)
+        self.assertEqual(resumed.summaries, {user_ids[0]: "- likes chess"})
+
+        with mock.patch.object(services, "sort_users_with_gpt_single_batch", side_effect=AssertionError("re-sorted")):
+            reused = services.sort_users_in_batches(batch, "3 groups", completed_batches=resumed.batches)
+        self.assertEqual(reused, result)
+
+    def test_other_instruction_or_finished_job_starts_fresh(self):
+        job = SortJob.open(self.SHEET, "3 groups")
+        job.save_maps({"Ada Lovelace": "uuid-1"}, {})
+
+        self.assertFalse(SortJob.open(self.SHEET, "4 groups").resumed)
+
+        job.finish()
+        fresh = SortJob.open(self.SHEET, "3 groups")
+        self.assertFalse(fresh.resumed)
+        self.assertEqual(fresh.name_to_uuid, {})
@@ -1,7 +1,8 @@
-import pandas as pd
 from io import BytesIO
 
 def parse_spreadsheet(uploaded_file):
+    import pandas as pd
+
     try:
         if uploaded_file.name.endswith('.csv'):
             df = pd.read_csv(uploaded_file)
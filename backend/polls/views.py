@@ -1,23 +1,24 @@
 import os
-from django.http import FileResponse
+import io
+import json
+import time
+import asyncio
+import zipfile
+import tempfile
+from django.http import HttpResponse, JsonResponse
+from django.views.decorators.csrf import csrf_exempt
 from rest_framework.decorators import api_view
 from rest_framework.response import Response
 from rest_framework import status
 from django.utils import timezone
+from django.conf import settings
 from .models import AccessKey
 import uuid
 import logging # for debug prints with gunicorn
 logger = logging.getLogger(__name__)
 
-from .utils import parse_spreadsheet
-from .services import (
-    clean_and_prepare_dataframe,
-    save_name_to_uuid_map,
-    save_manual_uuid_map,
-    run_preprocessing_pipeline,
-    sort_users_with_gpt,
-    translate_uuids_to_names_with_preferences,
-)
+# The sorting pipeline (pandas, openai) is imported inside the views that use it,
+# so worker boot, manage.py commands and collectstatic don't pay for it.
 
 # Columns with name references to be pseudonymized/translated
 PREFERENCE_COLUMNS = [
@@ -28,63 +29,87 @@ PREFERENCE_COLUMNS = [
     'Who you you want to be paired with? (You can list multiple names, just remember to put first and last)'
 ]
 TIMESTAMP_COLUMN = 'Timestamp'
+DEFAULT_INSTRUCTION = "Group people by similar vibes, energy, or common interests."
+BULK_MAX_FILES = 10
+STRIP_PROMPT_BOILERPLATE = getattr(settings, "STRIP_PROMPT_BOILERPLATE", True)
 
-@api_view(["POST"])
-def verify_key_without_increment(request):
-    key = request.data.get("key")
-    device_id = request.data.get("device_id")
+def _progress_reporter(total: int, every: int = 10):
+    """
+    Returns an `on_entry` callback that logs sort progress as assignments stream in.
+    Members re-sorted by an escalated model are counted once.
+    """
+    assigned = set()
 
-    if not key:
-        return Response({"valid": False, "message": "Missing access key."}, status=400)
+    def report(user_id, entry):
+        if user_id in assigned:
+            return
+        assigned.add(user_id)
+        if len(assigned) % every == 0 or len(assigned) == total:
+            logger.info("Sorted %d/%d members (latest: %s)", len(assigned), total, entry.get("family", ""))
 
-    access = AccessKey.objects.filter(key=key).first()
-    if not access:
-        return Response({"valid": False, "message": "Invalid access key."}, status=403)
-
-    if access.is_expired:
-        return Response({"valid": False, "message": "Key expired."}, status=403)
+    return report
 
-    if access.usage_count >= access.usage_limit:
-        return Response({"valid": False, "message": "Key usage limit reached."}, status=403)
+class SheetError(Exception):
+    """A sheet could not be sorted; the message is safe to show the user."""
 
-    # Still check device match
-    if access.device_id and device_id != access.device_id:
-        return Response({"valid": False, "message": "Key is already bound to another device."}, status=403)
+class KeyRejected(Exception):
+    """The access key sent with a sort can't be used."""
 
-    return Response({"valid": True})
+    def __init__(self, message: str, status_code: int):
+        super().__init__(message)
+        self.status_code = status_code
 
-@api_view(["POST"])
-def validate_key(request):
-    key = request.data.get("key")
-    device_id = request.data.get("device_id")
-    ip = (
+def _client_ip(request) -> str:
+    return (
         request.META.get("HTTP_X_FORWARDED_FOR", "").split(",")[0]
         or request.META.get("REMOTE_ADDR")
         or "unknown"
     )
 
+def _check_access_key(key, device_id, bound_message="Key is already bound to another device."):
+    """
+    Checks a key without charging it. Returns (access, None, None) when usable,
+    otherwise (None, error message, status code).
+    """
     if not key:
-        return Response({"valid": False, "message": "Missing access key."}, status=400)
+        return None, "Missing access key.", 400
 
     access = AccessKey.objects.filter(key=key).first()
     if not access:
-        return Response({"valid": False, "message": "Invalid access key."}, status=403)
+        return None, "Invalid access key.", 403
 
     if access.is_expired:
-        return Response({"valid": False, "message": "Key expired."}, status=403)
+        return None, "Key expired.", 403
 
     if access.usage_count >= access.usage_limit:
-        return Response({"valid": False, "message": "Key usage limit reached."}, status=403)
+        return None, "Key usage limit reached.", 403
 
-    # First-time device binding
     if access.device_id and device_id != access.device_id:
-        return Response({"valid": False, "message": "This key is already bound to another device."}, status=403)
+        return None, bound_message, 403
+
+    return access, None, None
 
+def _use_access_key(key, device_id, ip: str):
+    """
+    Checks and charges the key sent with a sort; returns its device id, or None if
+    no key was sent. Raises KeyRejected when the key can't be used.
+    """
+    if not key:
+        return None
+
+    access, message, code = _check_access_key(key, device_id)
+    if access is None:
+        raise KeyRejected(message, code)
+    return _charge_access_key(access, ip)
+
+def _charge_access_key(access: AccessKey, ip: str) -> str:
+    """
+    Uses up one run of a checked key, binding it to a device on first use.
+    Returns the key's device id.
+    """
+    # First-time device binding
     if not access.device_id:
-        generated_device_id = str(uuid.uuid4())
-        access.device_id = generated_device_id
-    else:
-        generated_device_id = access.device_id
+        access.device_id = str(uuid.uuid4())
 
     # Log the IP
     if ip not in access.ip_log:
@@ -94,6 +119,26 @@ def validate_key(request):
 
     access.usage_count += 1
     access.save()
+    return access.device_id
+
+@api_view(["POST"])
+def verify_key_without_increment(request):
+    access, message, code = _check_access_key(request.data.get("key"), request.data.get("device_id"))
+    if access is None:
+        return Response({"valid": False, "message": message}, status=code)
+
+    return Response({"valid": True})
+
+@api_view(["POST"])
+def validate_key(request):
+    access, message, code = _check_access_key(
+        request.data.get("key"), request.data.get("device_id"),
+        bound_message="This key is already bound to another device.",
+    )
+    if access is None:
+        return Response({"valid": False, "message": message}, status=code)
+
+    generated_device_id = _charge_access_key(access, _client_ip(request))
 
     return Response({
         "valid": True,
@@ -104,57 +149,409 @@ def validate_key(request):
 
 @api_view(["POST"])
 def handle_sorting(request):
+    """
+    Sorts one uploaded sheet. When the form carries `key` (and `device_id`), the key
+    is checked and charged one use per sort; identical concurrent submissions
+    (same file, instruction and key) share one run and one charge.
+    """
+    from .checkpoints import upload_key
+    from .coalesce import flight_key, sort_flights
+
     instruction = request.POST.get("comments", "").strip()
     uploaded_file = request.FILES.get("file")
 
     if not instruction:
-        instruction = "Group people by similar vibes, energy, or common interests."
+        instruction = DEFAULT_INSTRUCTION
 
     if not uploaded_file:
         return Response({"error": "No file uploaded."}, status=status.HTTP_400_BAD_REQUEST)
 
+    try:
+        budget = _sort_budget(request)
+    except SheetError as e:
+        return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+    key = request.POST.get("key")
+    device_id = request.POST.get("device_id")
+    ip = _client_ip(request)
+
+    # Only the first of several identical requests checks and charges the key;
+    # the others share its outcome, rejection included.
+    def run():
+        bound_device_id = _use_access_key(key, device_id, ip)
+        content, plan = _sort_sheet(uploaded_file, instruction, budget)
+        return content, plan, budget, bound_device_id
+
+    try:
+        content = _read_upload(uploaded_file)
+        (content, plan, budget, device_id), shared = sort_flights.do(flight_key(upload_key(content, instruction), key, device_id, budget.seconds), run)
+
+    except KeyRejected as e:
+        return Response({"valid": False, "message": str(e)}, status=e.status_code)
+
+    except SheetError as e:
+        return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+    except Exception as e:
+        return Response({"error": f"Processing failed: {str(e)}"}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+    return _csv_response(content, plan, budget, device_id, shared)
+
+def _read_upload(uploaded_file) -> bytes:
+    uploaded_file.seek(0)
+    content = uploaded_file.read()
+    uploaded_file.seek(0)
+    return content
+
+def _sort_budget(request):
+    """
+    Time budget from the request's `deadline` form field or X-Sort-Deadline header
+    (seconds); the server default when neither is sent.
+    """
+    from .budget import SortBudget
+
+    value = request.POST.get("deadline") or request.headers.get("X-Sort-Deadline")
+    try:
+        return SortBudget.from_value(value)
+    except ValueError:
+        raise SheetError("Invalid deadline: expected a number of seconds.")
+
+def _csv_response(content: bytes, plan=None, budget=None, device_id=None, shared=False) -> HttpResponse:
+    response = HttpResponse(content, content_type="text/csv")
+    response["Content-Disposition"] = 'attachment; filename="final_with_names.csv"'
+    if plan is not None:
+        response["X-Sort-Plan"] = plan.header()
+    if budget is not None:
+        response["X-Sort-Degraded"] = budget.header()
+    if device_id:
+        response["X-Device-Id"] = device_id
+    if shared:
+        response["X-Sort-Coalesced"] = "true"
+    return response
+
+def _sort_sheet(uploaded_file, instruction: str, budget):
+    """
+    Runs the full sync pipeline for one uploaded sheet within `budget` (a SortBudget).
+    Returns (final CSV bytes, the BatchPlan used for sorting).
+    """
+    from .utils import parse_spreadsheet
+    from .services import (
+        clean_and_prepare_dataframe,
+        build_cohort_profile,
+        iter_member_contents,
+        place_unsorted_locally,
+        run_preprocessing_pipeline,
+        sort_users_with_gpt,
+    )
+    from .cascade import track_cascade
+    from .batch_policy import plan_for
+
     df = parse_spreadsheet(uploaded_file)
     if df is None:
-        return Response({"error": "Failed to parse spreadsheet."}, status=status.HTTP_400_BAD_REQUEST)
+        raise SheetError("Failed to parse spreadsheet.")
 
-    try:
-        # 🧹 Pre-clean the data
-        cleaned_df, uuid_map, name_to_uuid, unmatched_map, pii_columns = clean_and_prepare_dataframe(
-            df, timestamp_column=TIMESTAMP_COLUMN, preference_columns=PREFERENCE_COLUMNS
-        )
+    # 💾 Resume from an earlier, interrupted run of the same sheet
+    job = _open_sort_job(uploaded_file, instruction)
+
+    # 🧹 Pre-clean the data
+    cleaned_df, uuid_map, name_to_uuid, unmatched_map, pii_columns = clean_and_prepare_dataframe(
+        df, timestamp_column=TIMESTAMP_COLUMN, preference_columns=PREFERENCE_COLUMNS,
+        known_uuids=job.name_to_uuid, known_manual=job.unmatched_map,
+    )
+    job.save_maps(name_to_uuid, unmatched_map)
+
+    # ✂️ Strip cohort-wide boilerplate from prompts
+    profile = build_cohort_profile(cleaned_df) if STRIP_PROMPT_BOILERPLATE else None
+    if profile is not None:
+        logger.info("Prompt boilerplate stripping: %s", profile.report())
 
+    # ⏱️ Fit the work into the deadline
+    members = len(cleaned_df)
+    budget.plan(members, plan_for(members), pending_summaries=members - len(job.summaries), concurrent_batches=False)
+
+    with track_cascade() as sort_cascade:
         # 🤖 Run AI preprocessing
-        members = cleaned_df.to_dict(orient="records")
-        summaries = run_preprocessing_pipeline(members)
+        summaries = run_preprocessing_pipeline(
+            iter_member_contents(cleaned_df, profile=profile),
+            completed=job.summaries, on_summary=job.record_summary, budget=budget,
+        )
+        job.flush()
 
         # 🧠 Final sort logic
         cleaned_df["summary"] = cleaned_df["user_id"].map(summaries)
-        family_map = sort_users_with_gpt(summaries, instruction)
-        cleaned_df["family"] = cleaned_df["user_id"].apply(lambda uid: family_map.get(str(uid).strip(), ""))
+        plan = budget.plan(len(summaries), plan_for(len(summaries)), concurrent_batches=False)
+        logger.info("Batch plan: %s", plan.as_dict())
+        family_map = sort_users_with_gpt(
+            summaries, instruction, batch_size=plan.batch_size, on_entry=_progress_reporter(len(summaries)),
+            completed_batches=job.batches, on_batch=job.record_batch, budget=budget,
+        )
+    family_map = place_unsorted_locally(summaries, family_map, instruction, budget)
+    logger.info("Model cascade stats: %s", sort_cascade.snapshot())
+    logger.info("Deadline budget: %s", budget.report())
 
-        # 💾 Save UUID maps
-        save_name_to_uuid_map(name_to_uuid)
-        save_manual_uuid_map(unmatched_map)
+    # 🧾 Translate UUIDs back to names
+    cleaned_df["degraded"] = cleaned_df["user_id"].astype(str).map(budget.flags)
+    content = _render_final_csv(cleaned_df, family_map, name_to_uuid, unmatched_map)
+    job.finish()
+    return content, plan
 
-        # 🧾 Translate UUIDs back to names
-        cleaned_df.to_csv("cleaned_output.csv", index=False)
+def _render_final_csv(cleaned_df, family_map, name_to_uuid, unmatched_map) -> bytes:
+    """
+    Writes the sorted frame and UUID maps into a private temp dir, translates
+    UUIDs back to names and returns the final CSV bytes.
+    Safe to run for several sorts at once in the same worker.
+    """
+    from .services import save_name_to_uuid_map, save_manual_uuid_map, translate_uuids_to_names_with_preferences
+
+    cleaned_df["family"] = cleaned_df["user_id"].apply(lambda uid: family_map.get(str(uid).strip(), ""))
+
+    with tempfile.TemporaryDirectory(prefix="sort-") as workdir:
+        name_to_uuid_path = os.path.join(workdir, "name_to_uuid_map.csv")
+        manual_uuid_path = os.path.join(workdir, "manual_uuid_map.csv")
+        sorted_csv_path = os.path.join(workdir, "cleaned_output.csv")
+        output_path = os.path.join(workdir, "final_with_names.csv")
+
+        save_name_to_uuid_map(name_to_uuid, filepath=name_to_uuid_path)
+        save_manual_uuid_map(unmatched_map, filepath=manual_uuid_path)
+        cleaned_df.to_csv(sorted_csv_path, index=False)
         translate_uuids_to_names_with_preferences(
-            sorted_csv_path="cleaned_output.csv",
-            name_to_uuid_path="name_to_uuid_map.csv",
-            manual_uuid_path="manual_uuid_map.csv",
-            output_path="final_with_names.csv"
+            sorted_csv_path=sorted_csv_path,
+            name_to_uuid_path=name_to_uuid_path,
+            manual_uuid_path=manual_uuid_path,
+            output_path=output_path,
+        )
+
+        with open(output_path, "rb") as f:
+            return f.read()
+
+def _open_sort_job(uploaded_file, instruction: str):
+    """
+    Opens (or resumes) the checkpointed job for this upload and instruction.
+    Leaves the upload rewound so it can still be parsed.
+    """
+    from .checkpoints import SortJob
+
+    job = SortJob.open(_read_upload(uploaded_file), instruction)
+    if job.resumed:
+        logger.info(
+            "Resuming sort job: %d summaries and %d batches already done.",
+            len(job.checkpoint.summaries), len(job.checkpoint.batch_results),
+        )
+    return job
+
+async def _sort_sheet_async(uploaded_file, instruction: str, budget, summary_cache=None):
+    """
+    Runs the full async pipeline for one uploaded sheet within `budget` (a SortBudget),
+    optionally sharing a `SummaryCache` with other sheets.
+    Returns (final CSV bytes, per-stage timings in seconds, the BatchPlan used for sorting).
+    """
+    from .utils import parse_spreadsheet
+    from .services import build_cohort_profile, clean_and_prepare_dataframe, iter_member_contents, place_unsorted_locally
+    from .async_services import SUMMARY_CONCURRENCY, arun_preprocessing_pipeline, asort_users_with_gpt, run_cpu_bound
+    from .cascade import track_cascade
+    from .batch_policy import plan_for
+    from asgiref.sync import sync_to_async
+
+    timings = {}
+    started = time.perf_counter()
+
+    def mark(stage):
+        nonlocal started
+        now = time.perf_counter()
+        timings[stage] = round(now - started, 3)
+        started = now
+
+    df = await run_cpu_bound(parse_spreadsheet, uploaded_file)
+    if df is None:
+        raise SheetError("Failed to parse spreadsheet.")
+    mark("parse")
+
+    # 💾 Resume from an earlier, interrupted run of the same sheet
+    job = await sync_to_async(_open_sort_job)(uploaded_file, instruction)
+
+    # 🧹 Pre-clean the data
+    cleaned_df, uuid_map, name_to_uuid, unmatched_map, pii_columns = await run_cpu_bound(
+        clean_and_prepare_dataframe,
+        df, timestamp_column=TIMESTAMP_COLUMN, preference_columns=PREFERENCE_COLUMNS,
+        known_uuids=job.name_to_uuid, known_manual=job.unmatched_map,
+    )
+    await sync_to_async(job.save_maps)(name_to_uuid, unmatched_map)
+    mark("clean")
+
+    # ✂️ Strip cohort-wide boilerplate from prompts
+    profile = None
+    if STRIP_PROMPT_BOILERPLATE:
+        profile = await run_cpu_bound(build_cohort_profile, cleaned_df)
+        logger.info("Prompt boilerplate stripping: %s", profile.report())
+    mark("profile")
+
+    # ⏱️ Fit the work into the deadline
+    members = len(cleaned_df)
+    budget.plan(
+        members, plan_for(members),
+        pending_summaries=members - len(job.summaries), summary_concurrency=SUMMARY_CONCURRENCY,
+    )
+
+    with track_cascade() as sort_cascade:
+        # 🤖 Run AI preprocessing
+        summaries = await arun_preprocessing_pipeline(
+            iter_member_contents(cleaned_df, profile=profile), cache=summary_cache,
+            completed=job.summaries, on_summary=sync_to_async(job.record_summary), budget=budget,
         )
+        await sync_to_async(job.flush)()
+        mark("summarize")
 
-        return FileResponse(
-            open("final_with_names.csv", "rb"),
-            as_attachment=True,
-            filename="final_with_names.csv"
+        # 🧠 Final sort logic
+        cleaned_df["summary"] = cleaned_df["user_id"].map(summaries)
+        plan = budget.plan(len(summaries), plan_for(len(summaries)))
+        logger.info("Batch plan: %s", plan.as_dict())
+        family_map = await asort_users_with_gpt(
+            summaries, instruction, batch_size=plan.batch_size, concurrency=plan.concurrency,
+            on_entry=_progress_reporter(len(summaries)),
+            completed_batches=job.batches, on_batch=sync_to_async(job.record_batch), budget=budget,
         )
+    family_map = await run_cpu_bound(place_unsorted_locally, summaries, family_map, instruction, budget)
+    mark("sort")
+    logger.info("Model cascade stats: %s", sort_cascade.snapshot())
+    logger.info("Deadline budget: %s", budget.report())
+
+    # 🧾 Translate UUIDs back to names
+    cleaned_df["degraded"] = cleaned_df["user_id"].astype(str).map(budget.flags)
+    content = await run_cpu_bound(_render_final_csv, cleaned_df, family_map, name_to_uuid, unmatched_map)
+    await sync_to_async(job.finish)()
+    mark("render")
+
+    return content, timings, plan
+
+@csrf_exempt
+async def handle_sorting_async(request):
+    """
+    Async version of `handle_sorting` for ASGI deployments.
+    LLM calls run concurrently on the async client while pandas steps run on a
+    thread pool, so one worker can drive many sorts at once.
+    """
+    if request.method != "POST":
+        return JsonResponse({"error": "Method not allowed."}, status=405)
+
+    instruction = request.POST.get("comments", "").strip() or DEFAULT_INSTRUCTION
+    uploaded_file = request.FILES.get("file")
+
+    if not uploaded_file:
+        return JsonResponse({"error": "No file uploaded."}, status=status.HTTP_400_BAD_REQUEST)
+
+    from asgiref.sync import sync_to_async
+    from .checkpoints import upload_key
+    from .coalesce import async_sort_flights, flight_key
+
+    try:
+        budget = _sort_budget(request)
+    except SheetError as e:
+        return JsonResponse({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+    key = request.POST.get("key")
+    device_id = request.POST.get("device_id")
+    ip = _client_ip(request)
+
+    async def run():
+        bound_device_id = await sync_to_async(_use_access_key)(key, device_id, ip)
+        content, timings, plan = await _sort_sheet_async(uploaded_file, instruction, budget)
+        return content, plan, budget, bound_device_id
+
+    try:
+        content = _read_upload(uploaded_file)
+        (content, plan, budget, device_id), shared = await async_sort_flights.do(flight_key(upload_key(content, instruction), key, device_id, budget.seconds), run)
+
+    except KeyRejected as e:
+        return JsonResponse({"valid": False, "message": str(e)}, status=e.status_code)
+
+    except SheetError as e:
+        return JsonResponse({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
 
     except Exception as e:
-        return Response({"error": f"Processing failed: {str(e)}"}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+        return JsonResponse({"error": f"Processing failed: {str(e)}"}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+    return _csv_response(content, plan, budget, device_id, shared)
+
+@csrf_exempt
+async def handle_bulk_sorting_async(request):
+    """
+    Sorts several sheets in one request.
+    Expects repeated `files` uploads and, optionally, one `comments` instruction per
+    file in the same order. All sheets run concurrently through the worker's shared
+    LLM client, rate limiter and one summary cache. Returns a zip with each sorted
+    CSV plus `timings.json` with per-sheet stage timings and batch plans.
+    """
+    if request.method != "POST":
+        return JsonResponse({"error": "Method not allowed."}, status=405)
+
+    uploaded_files = request.FILES.getlist("files")
+    instructions = request.POST.getlist("comments")
+
+    if not uploaded_files:
+        return JsonResponse({"error": "No files uploaded."}, status=status.HTTP_400_BAD_REQUEST)
+
+    if len(uploaded_files) > BULK_MAX_FILES:
+        return JsonResponse({"error": f"At most {BULK_MAX_FILES} files per bulk sort."}, status=status.HTTP_400_BAD_REQUEST)
+
+    try:
+        _sort_budget(request)
+    except SheetError as e:
+        return JsonResponse({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+    from .async_services import SummaryCache
+    from .cascade import track_cascade
+
+    summary_cache = SummaryCache()
+
+    async def run_sheet(idx, uploaded_file):
+        instruction = (instructions[idx].strip() if idx < len(instructions) else "") or DEFAULT_INSTRUCTION
+        budget = _sort_budget(request)  # every sheet gets the whole request's deadline
+        started = time.perf_counter()
+        try:
+            content, timings, plan = await _sort_sheet_async(uploaded_file, instruction, budget, summary_cache)
+            plan, error = plan.as_dict(), None
+        except Exception as e:
+            content, timings, plan, error = None, {}, None, str(e)
+        timings["total"] = round(time.perf_counter() - started, 3)
+        return uploaded_file.name, content, timings, plan, budget.report(), error
+
+    started = time.perf_counter()
+    with track_cascade() as bulk_cascade:
+        results = await asyncio.gather(*(run_sheet(idx, f) for idx, f in enumerate(uploaded_files)))
+    wall_time = round(time.perf_counter() - started, 3)
+
+    report = {
+        "wall_time": wall_time,
+        "summary_cache": {"hits": summary_cache.hits, "misses": summary_cache.misses},
+        "model_cascade": bulk_cascade.snapshot(),
+        "sheets": [],
+    }
+    buffer = io.BytesIO()
+    used_names = set()
+
+    with zipfile.ZipFile(buffer, "w", compression=zipfile.ZIP_DEFLATED) as archive:
+        for idx, (name, content, timings, plan, deadline, error) in enumerate(results):
+            stem = os.path.splitext(os.path.basename(name))[0] or f"sheet_{idx + 1}"
+            output_name = f"{stem}_sorted.csv"
+            if output_name in used_names:
+                output_name = f"{stem}_{idx + 1}_sorted.csv"
+            used_names.add(output_name)
+
+            if content is not None:
+                archive.writestr(output_name, content)
+            report["sheets"].append({
+                "file": name,
+                "output": output_name if content is not None else None,
+                "timings": timings,
+                "batch_plan": plan,
+                "deadline": deadline,
+                "error": error,
+            })
+
+        archive.writestr("timings.json", json.dumps(report, indent=2))
+
+    logger.info("Bulk sort of %d sheets finished in %.1fs", len(results), wall_time)
 
-    finally:
-        for path in ["cleaned_output.csv", "final_with_names.csv"]:
-            if os.path.exists(path):
-                os.remove(path)
+    response = HttpResponse(buffer.getvalue(), content_type="application/zip")
+    response["Content-Disposition"] = 'attachment; filename="sorted_sheets.zip"'
+    return response
@@ -35,7 +35,8 @@ function SortingPage({ isSorting, setIsSorting }) {
     const key = localStorage.getItem("access_key");
     const deviceId = localStorage.getItem("device_id");
 
-    const resValidate = await fetch("http://localhost:8000/api/validate-key/", {
+    // Check only; the sort request itself uses up one run of the key
+    const resValidate = await fetch("http://localhost:8000/api/verify-key/", {
       method: "POST",
       headers: { "Content-Type": "application/json" },
       body: JSON.stringify({ key, device_id: deviceId }),
@@ -63,6 +64,8 @@ function SortingPage({ isSorting, setIsSorting }) {
     const formData = new FormData();
     formData.append("file", file);
     formData.append("comments", textValue);
+    formData.append("key", key);
+    if (deviceId) formData.append("device_id", deviceId);
 
     const chaosMessages = [
       "Uploading CSV to NASA mainframe...",
@@ -115,6 +118,9 @@ function SortingPage({ isSorting, setIsSorting }) {
 
       if (!res.ok) throw new Error("Failed to sort.");
 
+      const boundDeviceId = res.headers.get("X-Device-Id");
+      if (boundDeviceId) localStorage.setItem("device_id", boundDeviceId);
+
       const blob = await res.blob();
 
       clearInterval(stageInterval);